@@ -0,0 +1,327 @@
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import mysql.connector
+import numpy as np
+import pandas as pd
+
+from compaction import SOURCE_COLUMNS, load_watermark, rollup_rows
+from indicator_engine import STORAGE_KEYS, compute_indicators
+from tick_buffer import MAX_TRADES, MIN_TRADES
+
+# Configure logging for bulk_load.py
+logger = logging.getLogger("bulk_load")
+logger.setLevel(logging.INFO)
+
+# File handler for bulk_load.log
+fh = logging.FileHandler('bulk_load.log')
+fh.setLevel(logging.INFO)
+formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+fh.setFormatter(formatter)
+logger.addHandler(fh)
+
+# Stream handler for console output
+sh = logging.StreamHandler()
+sh.setLevel(logging.INFO)
+sh.setFormatter(formatter)
+logger.addHandler(sh)
+
+# Database configuration
+DB_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "admin",
+    "database": "trading_db"
+}
+
+# Ticks read from the input file per pass
+READ_CHUNK_ROWS = 200_000
+# Rows per multi-row INSERT and number of parallel insert connections
+INSERT_BATCH_ROWS = 5000
+INSERT_WORKERS = 4
+# Ticks carried over between chunks so rolling indicators and EMAs continue across the boundary
+WARMUP_TICKS = 500
+
+INSERT_COLUMNS = [
+    'symbol', 'current_price', 'timestamp', 'timestamp_ns', 'trend', 'buy_score', 'sell_score', 'hold_score',
+    'ma5', 'ma10', 'ma15', 'ma30', 'macd', 'macd_signal', 'macd_diff', 'volume', 'rsi',
+    'bb_upper', 'bb_middle', 'bb_lower', 'stoch_k', 'stoch_d', 'vwap', 'spread', 'imbalance',
+    'processing_time'
+]
+INSERT_SQL = (
+    f"INSERT INTO pi_trades ({', '.join(INSERT_COLUMNS)}) "
+    f"VALUES ({', '.join(['%s'] * len(INSERT_COLUMNS))})"
+)
+
+
+def read_ticks(path, fmt=None, symbol=None, timestamp_unit='ns'):
+    """Yield normalized tick frames (symbol, timestamp in epoch ns, price, size) from a CSV or JSON lines file.
+
+    Accepts CoinAPI trade messages (symbol_id, time_exchange) as well as the trade dicts
+    produced by websocket_trades (symbol, timestamp). Numeric timestamps are read in
+    timestamp_unit ('s', 'ms', 'us' or 'ns').
+    """
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    if fmt == 'csv':
+        reader = pd.read_csv(path, chunksize=READ_CHUNK_ROWS)
+    else:
+        reader = pd.read_json(path, lines=True, chunksize=READ_CHUNK_ROWS,
+                              convert_dates=False, keep_default_dates=False)
+    for chunk in reader:
+        chunk = chunk.rename(columns={'symbol_id': 'symbol', 'time_exchange': 'timestamp'})
+        if symbol:
+            chunk['symbol'] = symbol
+        if 'type' in chunk:
+            chunk = chunk[chunk['type'] == 'trade']
+        if pd.api.types.is_numeric_dtype(chunk['timestamp']):
+            timestamps = pd.to_datetime(chunk['timestamp'], unit=timestamp_unit, utc=True)
+        else:
+            timestamps = pd.to_datetime(chunk['timestamp'], utc=True, format='ISO8601')
+        # pandas infers the resolution (e.g. microseconds for ISO strings); always count in ns
+        timestamps = timestamps.dt.as_unit('ns').astype('int64')
+        yield pd.DataFrame({
+            'symbol': chunk['symbol'].astype(str).values,
+            'timestamp': timestamps.values,
+            'price': pd.to_numeric(chunk['price'], errors='coerce').fillna(0.0).values,
+            'size': pd.to_numeric(chunk['size'], errors='coerce').fillna(0.0).values
+        })
+
+
+def calculate_trend(df):
+    """Vectorized calculate_trend: mean change over the last five prices."""
+    avg_change = (df['price'] - df['price'].shift(4)) / 4
+    trend = np.where(avg_change > 0.001, 'Up', np.where(avg_change < -0.001, 'Down', 'Flat'))
+    return np.where(avg_change.isna(), 'N/A', trend)
+
+
+def calculate_recommendations(df):
+    """Vectorized calculate_recommendations, one score triple per row."""
+    buy = np.zeros(len(df), dtype=np.int64)
+    sell = np.zeros(len(df), dtype=np.int64)
+    price = df['price']
+
+    def add(buy_mask, sell_mask, points):
+        buy_mask = buy_mask.to_numpy()
+        buy[buy_mask] += points
+        sell[~buy_mask & sell_mask.to_numpy()] += points
+
+    if 'RSI' in df:
+        add(df['RSI'] < 30, df['RSI'] > 70, 4)
+    if 'MACD_diff' in df:
+        diff, prev = df['MACD_diff'], df['MACD_diff'].shift(1)
+        add((diff > 0) & (prev <= 0), (diff < 0) & (prev >= 0), 3)
+    if 'BB_lower' in df and 'BB_upper' in df:
+        add(price < df['BB_lower'], price > df['BB_upper'], 3)
+    if 'Stoch_K' in df:
+        add(df['Stoch_K'] < 20, df['Stoch_K'] > 80, 3)
+    if 'MA5' in df and 'MA10' in df:
+        ma5, ma10 = df['MA5'], df['MA10']
+        prev5, prev10 = ma5.shift(1), ma10.shift(1)
+        add((ma5 > ma10) & (prev5 <= prev10), (ma5 < ma10) & (prev5 >= prev10), 2)
+
+    buy = np.clip(buy, 1, 10)
+    sell = np.clip(sell, 1, 10)
+    hold = np.clip(10 - (buy + sell) // 2, 1, 10)
+    return buy, sell, hold
+
+
+def build_rows(symbol, ticks):
+    """Compute indicators for a time-ordered tick frame of one symbol and return pi_trades rows."""
+    df = compute_indicators(ticks[['timestamp', 'price', 'size']].reset_index(drop=True))
+    # Live Volume/VWAP cover the MAX_TRADES window process_trades works on, not all history
+    if 'Volume' in df:
+        df['Volume'] = df['size'].rolling(MAX_TRADES, min_periods=1).sum()
+    if 'VWAP' in df:
+        notional = (df['price'] * df['size']).rolling(MAX_TRADES, min_periods=1).sum()
+        df['VWAP'] = (notional / df['size'].rolling(MAX_TRADES, min_periods=1).sum()).fillna(0.0)
+    buy, sell, hold = calculate_recommendations(df)
+
+    out = pd.DataFrame({
+        'symbol': symbol,
+        'current_price': df['price'].round(8),
+        'timestamp': pd.to_datetime(df['timestamp'], unit='ns').dt.strftime('%Y-%m-%d %H:%M:%S.%f'),
+        'timestamp_ns': df['timestamp'].astype('int64'),
+        'trend': calculate_trend(df),
+        'buy_score': buy,
+        'sell_score': sell,
+        'hold_score': hold,
+    })
+    for column, key in STORAGE_KEYS.items():
+        out[key] = df[column].round(8) if column in df else 0.0
+    # No order book in historical trade files
+    out['spread'] = 0.0
+    out['imbalance'] = 0.0
+    out['processing_time'] = 0.0
+    return out[INSERT_COLUMNS]
+
+
+def _existing_timestamps(conn, symbol, start_ns, end_ns):
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT DISTINCT timestamp_ns FROM pi_trades WHERE symbol = %s AND timestamp_ns BETWEEN %s AND %s",
+        (symbol, start_ns, end_ns)
+    )
+    existing = {row[0] for row in cursor.fetchall()}
+    cursor.close()
+    return existing
+
+
+def _insert_batch(rows):
+    """Insert one batch on its own connection; executemany sends it as a multi-row INSERT."""
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        cursor = conn.cursor()
+        cursor.executemany(INSERT_SQL, rows)
+        conn.commit()
+        cursor.close()
+        return len(rows)
+    finally:
+        conn.close()
+
+
+def _watermark_ns(conn):
+    """Compaction watermark in epoch ns; history older than this only lives in the rollup tables."""
+    cursor = conn.cursor()
+    try:
+        watermark = load_watermark(cursor)
+    except mysql.connector.Error:
+        watermark = None  # Compaction has not run against this database yet
+    finally:
+        cursor.close()
+    return None if watermark is None else int(pd.Timestamp(watermark).as_unit('ns').value)
+
+
+def _rollup_history(conn, symbol, rows):
+    """Merge rows older than the compaction watermark into pi_trades_1m / pi_trades_1h.
+
+    Compaction would delete them from pi_trades on its next pass. Minutes that already have a
+    bucket are skipped, so loading the same file twice does not count it twice.
+    """
+    timestamps = pd.to_datetime(rows['timestamp_ns'], unit='ns')
+    minutes = timestamps.dt.floor('min')
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT bucket_start FROM pi_trades_1m WHERE symbol = %s AND bucket_start BETWEEN %s AND %s",
+        (symbol, minutes.min().to_pydatetime(), minutes.max().to_pydatetime())
+    )
+    existing = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    keep = ~minutes.isin(existing)
+    if not keep.any():
+        return 0
+    source = rows.loc[keep, SOURCE_COLUMNS].astype(object).itertuples(index=False, name=None)
+    # DATETIME values as plain datetimes, like the rows compaction reads back from pi_trades
+    values = [(row[0], value.to_pydatetime()) + row[2:] for row, value in zip(source, timestamps[keep])]
+    rollup_rows(conn, values)
+    return len(values)
+
+
+def ensure_index(conn):
+    """The duplicate check looks rows up by symbol and timestamp_ns."""
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'pi_trades' AND INDEX_NAME = 'idx_pi_trades_symbol_ts'"
+    )
+    if cursor.fetchone()[0] == 0:
+        logger.info("Creating index idx_pi_trades_symbol_ts on pi_trades")
+        cursor.execute("CREATE INDEX idx_pi_trades_symbol_ts ON pi_trades (symbol, timestamp_ns)")
+        conn.commit()
+    cursor.close()
+
+
+def bulk_load(paths, fmt=None, symbol=None, workers=INSERT_WORKERS, dry_run=False, timestamp_unit='ns'):
+    """Backfill pi_trades from historical tick files; ticks already stored for a symbol are skipped.
+
+    Rows older than the compaction watermark go straight into the rollup tables instead.
+    Files are read in chunks, so each symbol's ticks must be in time order across chunks: a
+    tick older than the last tick of an earlier chunk cannot be placed and is counted in
+    totals['out_of_order'] instead of being loaded. Sort such files by timestamp first.
+    """
+    conn = None if dry_run else mysql.connector.connect(**DB_CONFIG)
+    if conn:
+        ensure_index(conn)
+    carry = {}
+    seen = {}
+    totals = {'ticks': 0, 'skipped': 0, 'out_of_order': 0, 'inserted': 0, 'rolled_up': 0}
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for path in paths:
+            logger.info(f"Loading {path}")
+            for chunk in read_ticks(path, fmt, symbol, timestamp_unit):
+                chunk = chunk.drop_duplicates()
+                totals['ticks'] += len(chunk)
+                futures = []
+                watermark_ns = _watermark_ns(conn) if conn else None
+                for name, ticks in chunk.groupby('symbol', sort=False):
+                    previous = carry.get(name)
+                    ticks = ticks.sort_values('timestamp', kind='stable')
+                    carried = 0
+                    if previous is not None:
+                        late = ticks['timestamp'] < previous['timestamp'].iloc[-1]
+                        if late.any():
+                            totals['out_of_order'] += int(late.sum())
+                            logger.warning(
+                                f"Dropped {int(late.sum())} {name} ticks in {path} older than an earlier chunk's "
+                                f"last tick; sort the file by timestamp to load them"
+                            )
+                            ticks = ticks[~late]
+                        ticks = pd.concat([previous, ticks], ignore_index=True)
+                        carried = len(previous)
+                    rows = build_rows(name, ticks)
+                    # Skip carried-over ticks and, like process_trades, the first MIN_TRADES - 1 of a symbol
+                    earlier = seen.get(name, 0) - carried
+                    rows = rows.iloc[max(carried, MIN_TRADES - 1 - earlier):]
+                    seen[name] = seen.get(name, 0) + len(ticks) - carried
+                    carry[name] = ticks.tail(WARMUP_TICKS)
+                    if rows.empty:
+                        continue
+                    if conn:
+                        existing = _existing_timestamps(
+                            conn, name, int(rows['timestamp_ns'].iloc[0]), int(rows['timestamp_ns'].iloc[-1])
+                        )
+                        if existing:
+                            before = len(rows)
+                            rows = rows[~rows['timestamp_ns'].isin(existing)]
+                            totals['skipped'] += before - len(rows)
+                        if watermark_ns is not None and not rows.empty and rows['timestamp_ns'].iloc[0] < watermark_ns:
+                            old = rows['timestamp_ns'] < watermark_ns
+                            totals['rolled_up'] += _rollup_history(conn, name, rows[old])
+                            rows = rows[~old]
+                    values = list(rows.astype(object).itertuples(index=False, name=None))
+                    if dry_run:
+                        totals['inserted'] += len(values)
+                        continue
+                    for offset in range(0, len(values), INSERT_BATCH_ROWS):
+                        futures.append(pool.submit(_insert_batch, values[offset:offset + INSERT_BATCH_ROWS]))
+                # Finish this chunk before reading the next so memory stays bounded
+                for future in futures:
+                    totals['inserted'] += future.result()
+                logger.info(
+                    f"Progress: {totals['ticks']} ticks read, {totals['inserted']} rows inserted, "
+                    f"{totals['rolled_up']} rolled up, {totals['skipped']} already present, "
+                    f"{totals['out_of_order']} out of order ({time.time() - start:.1f}s)"
+                )
+    if conn:
+        conn.close()
+    logger.info(f"Bulk load finished: {totals}")
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill pi_trades from recorded or exported tick files.")
+    parser.add_argument("paths", nargs="+", help="CSV or JSON lines files with symbol, price, size and timestamp")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Input format (default: from file extension)")
+    parser.add_argument("--symbol", help="Symbol to use when the file has no symbol column")
+    parser.add_argument("--workers", type=int, default=INSERT_WORKERS, help="Parallel insert connections")
+    parser.add_argument("--dry-run", action="store_true", help="Compute rows without touching MySQL")
+    parser.add_argument("--timestamp-unit", choices=["s", "ms", "us", "ns"], default="ns",
+                        help="Unit of numeric timestamp columns (ISO strings are detected)")
+    args = parser.parse_args()
+    missing = [path for path in args.paths if not os.path.exists(path)]
+    if missing:
+        parser.error(f"File not found: {', '.join(missing)}")
+    bulk_load(args.paths, args.format, args.symbol, args.workers, args.dry_run, args.timestamp_unit)
@@ -0,0 +1,401 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from threading import Thread
+
+import mysql.connector
+import pytz
+
+# Configure logging for compaction.py
+logger = logging.getLogger("compaction")
+logger.setLevel(logging.INFO)
+
+# File handler for compaction.log
+fh = logging.FileHandler('compaction.log')
+fh.setLevel(logging.INFO)
+formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+fh.setFormatter(formatter)
+logger.addHandler(fh)
+
+# Stream handler for console output
+sh = logging.StreamHandler()
+sh.setLevel(logging.INFO)
+sh.setFormatter(formatter)
+logger.addHandler(sh)
+
+# Database configuration
+DB_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "admin",
+    "database": "trading_db"
+}
+
+# Raw pi_trades rows newer than this are never touched
+RAW_RETENTION_HOURS = 24
+# Raw rows are rolled up and deleted one hour at a time
+CHUNK = timedelta(hours=1)
+# Small delete batches with a pause in between keep locks short for the live writer
+DELETE_BATCH_SIZE = 1000
+DELETE_PAUSE_SECONDS = 0.2
+# Pause between hour chunks, and between passes once caught up
+CHUNK_PAUSE_SECONDS = 1
+IDLE_SECONDS = 300
+
+# Indicator columns rolled up as the last value in the bucket
+LAST_COLUMNS = [
+    'trend', 'buy_score', 'sell_score', 'hold_score', 'ma5', 'ma10', 'ma15', 'ma30',
+    'macd', 'macd_signal', 'macd_diff', 'volume', 'rsi', 'bb_upper', 'bb_middle', 'bb_lower',
+    'stoch_k', 'stoch_d', 'vwap'
+]
+# Columns rolled up as the mean over the bucket
+MEAN_COLUMNS = ['spread', 'imbalance', 'processing_time']
+
+ROLLUP_TABLES = {'pi_trades_1m': timedelta(minutes=1), 'pi_trades_1h': timedelta(hours=1)}
+
+
+def _rollup_table_sql(table):
+    indicator_columns = ",\n            ".join(
+        f"{column} VARCHAR(10)" if column == 'trend' else
+        f"{column} INT" if column.endswith('_score') else
+        f"{column} DECIMAL(20, 8)"
+        for column in LAST_COLUMNS + MEAN_COLUMNS
+    )
+    return f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            symbol VARCHAR(255) NOT NULL,
+            bucket_start DATETIME NOT NULL,
+            open DECIMAL(20, 8),
+            high DECIMAL(20, 8),
+            low DECIMAL(20, 8),
+            close DECIMAL(20, 8),
+            row_count INT,
+            open_time DATETIME(6),
+            close_time DATETIME(6),
+            {indicator_columns},
+            PRIMARY KEY (symbol, bucket_start)
+        )
+    """
+
+
+def _ensure_column(cursor, table, column, definition):
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+        (table, column)
+    )
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        logger.info(f"Added column {column} to {table}")
+
+
+def setup_tables(conn):
+    """Create the rollup and progress tables and the index the range scans rely on."""
+    cursor = conn.cursor()
+    for table in ROLLUP_TABLES:
+        cursor.execute(_rollup_table_sql(table))
+        # Time of the first/last row in the bucket, so rows arriving later can be merged in
+        _ensure_column(cursor, table, 'open_time', 'DATETIME(6) AFTER row_count')
+        _ensure_column(cursor, table, 'close_time', 'DATETIME(6) AFTER open_time')
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS pi_compaction_state (
+            name VARCHAR(64) PRIMARY KEY,
+            watermark DATETIME(6) NOT NULL
+        )
+    """)
+    # Chunk rolled up but not yet deleted: rows in [pending_start, pending_end) with id <= pending_max_id
+    _ensure_column(cursor, 'pi_compaction_state', 'pending_start', 'DATETIME(6) NULL')
+    _ensure_column(cursor, 'pi_compaction_state', 'pending_end', 'DATETIME(6) NULL')
+    _ensure_column(cursor, 'pi_compaction_state', 'pending_max_id', 'BIGINT NULL')
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'pi_trades' AND INDEX_NAME = 'idx_pi_trades_timestamp'"
+    )
+    if cursor.fetchone()[0] == 0:
+        logger.info("Creating index idx_pi_trades_timestamp on pi_trades (one-off, may take a while)")
+        cursor.execute("CREATE INDEX idx_pi_trades_timestamp ON pi_trades (timestamp)")
+    conn.commit()
+    cursor.close()
+
+
+def _floor(value, step):
+    if step >= timedelta(hours=1):
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(second=0, microsecond=0)
+
+
+# Raw pi_trades columns a rollup is built from, in the order rollup_rows expects them
+SOURCE_COLUMNS = ['symbol', 'timestamp', 'current_price'] + LAST_COLUMNS + MEAN_COLUMNS
+# Rollup table columns after (symbol, bucket_start)
+VALUE_COLUMNS = ['open', 'high', 'low', 'close', 'row_count', 'open_time', 'close_time'] + LAST_COLUMNS + MEAN_COLUMNS
+
+
+class _Bucket:
+    """OHLC of price plus last/mean indicator values for one symbol and period."""
+
+    def __init__(self, price, timestamp):
+        self.open = self.high = self.low = self.close = price
+        self.open_time = self.close_time = timestamp
+        self.count = 0
+        self.last = None
+        self.sums = [Decimal(0)] * len(MEAN_COLUMNS)
+
+    def add(self, timestamp, price, last, means):
+        # Rows of a chunk come in time order, merged rows and stored buckets may not
+        if timestamp < self.open_time:
+            self.open, self.open_time = price, timestamp
+        if timestamp >= self.close_time or self.last is None:
+            self.close, self.close_time, self.last = price, timestamp, last
+        self.high = max(self.high, price)
+        self.low = min(self.low, price)
+        self.count += 1
+        self.sums = [total + (value or 0) for total, value in zip(self.sums, means)]
+
+    def merge(self, stored, bucket_start, step):
+        """Fold in a bucket already in a rollup table (stored: VALUE_COLUMNS values)."""
+        open_, high, low, close, count, open_time, close_time = stored[:7]
+        last = stored[7:7 + len(LAST_COLUMNS)]
+        means = stored[7 + len(LAST_COLUMNS):]
+        # Buckets written before open_time/close_time existed span the whole period
+        open_time = open_time or bucket_start
+        close_time = close_time or bucket_start + step - timedelta(microseconds=1)
+        if open_time <= self.open_time:
+            self.open, self.open_time = open_, open_time
+        if close_time >= self.close_time:
+            self.close, self.close_time, self.last = close, close_time, last
+        self.high = max(self.high, high)
+        self.low = min(self.low, low)
+        self.count += count
+        self.sums = [total + (value or 0) * count for total, value in zip(self.sums, means)]
+
+    def values(self):
+        means = [total / self.count for total in self.sums]
+        return [self.open, self.high, self.low, self.close, self.count, self.open_time, self.close_time] + \
+            list(self.last) + means
+
+
+def _aggregate(rows, buckets):
+    """Add SOURCE_COLUMNS rows to {table: {(symbol, bucket_start): _Bucket}}."""
+    for row in rows:
+        symbol, timestamp, price = row[0], row[1], row[2]
+        if price is None:
+            continue
+        last = row[3:3 + len(LAST_COLUMNS)]
+        means = row[3 + len(LAST_COLUMNS):]
+        for table, step in ROLLUP_TABLES.items():
+            key = (symbol, _floor(timestamp, step))
+            bucket = buckets[table].get(key)
+            if bucket is None:
+                bucket = buckets[table][key] = _Bucket(price, timestamp)
+            bucket.add(timestamp, price, last, means)
+
+
+def _write_buckets(cursor, buckets, merge):
+    """Upsert buckets; with merge, buckets already stored are combined with the new rows first."""
+    for table, table_buckets in buckets.items():
+        if not table_buckets:
+            continue
+        if merge:
+            keys = list(table_buckets)
+            for offset in range(0, len(keys), DELETE_BATCH_SIZE):
+                batch = keys[offset:offset + DELETE_BATCH_SIZE]
+                cursor.execute(
+                    f"SELECT symbol, bucket_start, {', '.join(VALUE_COLUMNS)} FROM {table} "
+                    f"WHERE (symbol, bucket_start) IN ({', '.join(['(%s, %s)'] * len(batch))}) FOR UPDATE",
+                    [value for key in batch for value in key]
+                )
+                for stored in cursor.fetchall():
+                    table_buckets[(stored[0], stored[1])].merge(stored[2:], stored[1], ROLLUP_TABLES[table])
+        # Without merge the upsert overwrites, so a re-run of an interrupted chunk does not double count
+        cursor.executemany(
+            f"INSERT INTO {table} (symbol, bucket_start, {', '.join(VALUE_COLUMNS)}) "
+            f"VALUES ({', '.join(['%s'] * (len(VALUE_COLUMNS) + 2))}) "
+            f"ON DUPLICATE KEY UPDATE {', '.join(f'{c} = VALUES({c})' for c in VALUE_COLUMNS)}",
+            [[symbol, bucket_start] + bucket.values() for (symbol, bucket_start), bucket in table_buckets.items()]
+        )
+
+
+def rollup_rows(conn, rows):
+    """Merge SOURCE_COLUMNS rows into pi_trades_1m / pi_trades_1h and commit.
+
+    For rows older than the watermark that never reach pi_trades (e.g. bulk_load backfills).
+    Returns the number of minute buckets touched.
+    """
+    buckets = {table: {} for table in ROLLUP_TABLES}
+    # Same types as rows read back from MySQL (DECIMAL columns come back as Decimal)
+    _aggregate([[Decimal(repr(value)) if isinstance(value, float) else value for value in row] for row in rows], buckets)
+    cursor = conn.cursor()
+    _write_buckets(cursor, buckets, merge=True)
+    conn.commit()
+    cursor.close()
+    return len(buckets['pi_trades_1m'])
+
+
+def load_watermark(cursor):
+    """Raw rows older than the returned time have been rolled up (None before the first run)."""
+    cursor.execute("SELECT watermark FROM pi_compaction_state WHERE name = 'pi_trades'")
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _load_state(cursor):
+    cursor.execute(
+        "SELECT watermark, pending_start, pending_end, pending_max_id FROM pi_compaction_state WHERE name = 'pi_trades'"
+    )
+    row = cursor.fetchone()
+    if row:
+        return row[0], (row[1:] if row[3] is not None else None)
+    cursor.execute("SELECT MIN(timestamp) FROM pi_trades")
+    oldest = cursor.fetchone()[0]
+    return (_floor(oldest, CHUNK) if oldest else None), None
+
+
+def _rollup_chunk(conn, chunk_start, chunk_end):
+    """Aggregate raw rows in [chunk_start, chunk_end) and upsert them with the new watermark.
+
+    Returns the (start, end, max id) of the rows to delete, or None if the chunk was empty.
+    """
+    buckets = {table: {} for table in ROLLUP_TABLES}
+    cursor = conn.cursor()
+    # A locking read waits for inserts into the range still in flight, so every row with
+    # id <= max_id in the range is part of this rollup
+    cursor.execute(
+        f"SELECT id, {', '.join(SOURCE_COLUMNS)} FROM pi_trades "
+        "WHERE timestamp >= %s AND timestamp < %s ORDER BY timestamp ASC, id ASC LOCK IN SHARE MODE",
+        (chunk_start, chunk_end)
+    )
+    raw_rows = 0
+    max_id = None
+    while True:
+        rows = cursor.fetchmany(5000)
+        if not rows:
+            break
+        raw_rows += len(rows)
+        max_id = max([max_id or 0] + [row[0] for row in rows])
+        _aggregate([row[1:] for row in rows], buckets)
+    cursor.close()
+
+    cursor = conn.cursor()
+    _write_buckets(cursor, buckets, merge=False)
+    pending = (chunk_start, chunk_end, max_id) if raw_rows else (None, None, None)
+    cursor.execute(
+        "INSERT INTO pi_compaction_state (name, watermark, pending_start, pending_end, pending_max_id) "
+        "VALUES ('pi_trades', %s, %s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE watermark = VALUES(watermark), pending_start = VALUES(pending_start), "
+        "pending_end = VALUES(pending_end), pending_max_id = VALUES(pending_max_id)",
+        (chunk_end,) + pending
+    )
+    conn.commit()
+    cursor.close()
+    logger.info(
+        f"Rolled up {raw_rows} raw rows from {chunk_start} to {chunk_end} into "
+        f"{len(buckets['pi_trades_1m'])} minute and {len(buckets['pi_trades_1h'])} hour buckets"
+    )
+    return pending if raw_rows else None
+
+
+def _delete_chunk(conn, pending):
+    """Delete the rows of a rolled-up chunk in small batches so the live writer is not blocked."""
+    chunk_start, chunk_end, max_id = pending
+    cursor = conn.cursor()
+    deleted = 0
+    while True:
+        cursor.execute(
+            "DELETE FROM pi_trades WHERE timestamp >= %s AND timestamp < %s AND id <= %s "
+            "ORDER BY timestamp LIMIT %s",
+            (chunk_start, chunk_end, max_id, DELETE_BATCH_SIZE)
+        )
+        conn.commit()
+        deleted += cursor.rowcount
+        if cursor.rowcount < DELETE_BATCH_SIZE:
+            break
+        time.sleep(DELETE_PAUSE_SECONDS)
+    cursor.execute(
+        "UPDATE pi_compaction_state SET pending_start = NULL, pending_end = NULL, pending_max_id = NULL "
+        "WHERE name = 'pi_trades'"
+    )
+    conn.commit()
+    cursor.close()
+    if deleted:
+        logger.info(f"Deleted {deleted} rolled-up raw rows from {chunk_start} to {chunk_end}")
+
+
+def _rollup_late_rows(conn, watermark):
+    """Merge raw rows that arrived below the watermark (backfills, spool replays) into their buckets.
+
+    Each batch is merged and deleted in one transaction, so a row is counted exactly once.
+    """
+    merged = 0
+    while True:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT id, {', '.join(SOURCE_COLUMNS)} FROM pi_trades WHERE timestamp < %s "
+            "ORDER BY timestamp ASC, id ASC LIMIT %s LOCK IN SHARE MODE",
+            (watermark, DELETE_BATCH_SIZE)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            conn.commit()
+            cursor.close()
+            break
+        buckets = {table: {} for table in ROLLUP_TABLES}
+        _aggregate([row[1:] for row in rows], buckets)
+        _write_buckets(cursor, buckets, merge=True)
+        ids = [row[0] for row in rows]
+        cursor.execute(f"DELETE FROM pi_trades WHERE id IN ({', '.join(['%s'] * len(ids))})", ids)
+        conn.commit()
+        cursor.close()
+        merged += len(rows)
+        time.sleep(DELETE_PAUSE_SECONDS)
+    if merged:
+        logger.info(f"Merged {merged} late raw rows older than {watermark} into the rollups")
+
+
+def compact(conn):
+    """Roll up and delete every whole hour of raw rows older than the retention window."""
+    cutoff = _floor(datetime.now(pytz.UTC).replace(tzinfo=None) - timedelta(hours=RAW_RETENTION_HOURS), CHUNK)
+    cursor = conn.cursor()
+    watermark, pending = _load_state(cursor)
+    cursor.close()
+    if watermark is None:
+        return
+    # Finish deletes that a previous run committed the rollups for but did not complete
+    if pending:
+        _delete_chunk(conn, pending)
+    _rollup_late_rows(conn, watermark)
+    while watermark < cutoff:
+        chunk_end = watermark + CHUNK
+        pending = _rollup_chunk(conn, watermark, chunk_end)
+        if pending:
+            _delete_chunk(conn, pending)
+        watermark = chunk_end
+        time.sleep(CHUNK_PAUSE_SECONDS)
+
+
+def run_compaction():
+    """Background job: keep recent raw rows, roll older ones into pi_trades_1m / pi_trades_1h."""
+    logger.info("Starting pi_trades compaction...")
+    conn = None
+    while True:
+        try:
+            if conn is None or not conn.is_connected():
+                conn = mysql.connector.connect(**DB_CONFIG)
+                setup_tables(conn)
+            compact(conn)
+        except mysql.connector.Error as err:
+            logger.error(f"Compaction failed, will resume from the last watermark: {err}")
+            conn = None
+        except Exception as e:
+            logger.error(f"Error in compaction: {e}")
+        time.sleep(IDLE_SECONDS)
+
+
+if __name__ == "__main__":
+    compaction_thread = Thread(target=run_compaction, daemon=True)
+    compaction_thread.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        logger.info("Shutting down compaction...")
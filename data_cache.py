@@ -0,0 +1,134 @@
+import bisect
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import pytz
+
+from time_utils import NS_PER_SECOND, datetime_to_ns, ns_to_datetime
+
+# Configure logging for data_cache.py
+logger = logging.getLogger("data_cache")
+logger.setLevel(logging.INFO)
+
+# File handler for data_cache.log
+fh = logging.FileHandler('data_cache.log')
+fh.setLevel(logging.INFO)
+formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+fh.setFormatter(formatter)
+logger.addHandler(fh)
+
+# Stream handler for console output
+sh = logging.StreamHandler()
+sh.setLevel(logging.INFO)
+sh.setFormatter(formatter)
+logger.addHandler(sh)
+
+# How long rows stay in memory; older ranges are read from MySQL
+CACHE_RETENTION_SECONDS = 15 * 60
+
+# Columns returned by fetch_data, in the same order as the pi_trades SELECT
+FETCH_COLUMNS = [
+    'timestamp', 'timestamp_ns', 'current_price', 'symbol', 'trend', 'buy_score', 'sell_score', 'hold_score',
+    'ma5', 'ma10', 'ma15', 'ma30', 'macd', 'macd_signal', 'macd_diff', 'volume', 'rsi',
+    'bb_upper', 'bb_middle', 'bb_lower', 'stoch_k', 'stoch_d', 'vwap', 'spread', 'imbalance'
+]
+
+# latest_data keys that are stored under a different pi_trades column name
+RENAMED_KEYS = {'buy': 'buy_score', 'sell': 'sell_score', 'hold': 'hold_score'}
+
+# Per-symbol rows ordered by time: symbol -> (deque of epoch nanoseconds, deque of rows)
+_cache = {}
+cache_lock = threading.Lock()
+
+# Epoch nanoseconds from which every row produced by this process is in the cache (None = cache not fed)
+_active_since = None
+
+
+def mark_cache_active():
+    """Called by the writer (process_trades) once it starts producing rows in this process."""
+    global _active_since
+    with cache_lock:
+        if _active_since is None:
+            _active_since = time.time_ns()
+            logger.info("Read cache active, serving recent fetch windows from memory")
+
+
+def _to_ns(value):
+    """Convert a latest_data timestamp (epoch nanoseconds) or a datetime to epoch nanoseconds."""
+    if isinstance(value, datetime):
+        return datetime_to_ns(value)
+    return int(value)
+
+
+def _horizon():
+    return time.time_ns() - CACHE_RETENTION_SECONDS * NS_PER_SECOND
+
+
+def _to_fetch_row(data):
+    """Shape a latest_data dict like a pi_trades row returned by fetch_data."""
+    row = {}
+    for key, value in data.items():
+        row[RENAMED_KEYS.get(key, key)] = value
+    # Same text MySQL gives back for a DATETIME(6) value, full precision in timestamp_ns
+    row['timestamp'] = ns_to_datetime(data['timestamp']).replace(tzinfo=None).isoformat()
+    row['timestamp_ns'] = data['timestamp']
+    return {column: row.get(column) for column in FETCH_COLUMNS}
+
+
+def _evict(times, rows, horizon):
+    while times and times[0] < horizon:
+        times.popleft()
+        rows.popleft()
+
+
+def add_row(data):
+    """Add a row that is on its way to MySQL through the spool."""
+    try:
+        ts = _to_ns(data['timestamp'])
+        row = _to_fetch_row(data)
+    except (KeyError, TypeError, ValueError) as e:
+        logger.error(f"Cannot cache row: {e}")
+        return
+    with cache_lock:
+        times, rows = _cache.setdefault(data['symbol'], (deque(), deque()))
+        if times and ts < times[-1]:
+            # Late row: keep the deque ordered so range lookups can bisect
+            index = bisect.bisect_right(times, ts)
+            times.insert(index, ts)
+            rows.insert(index, row)
+        else:
+            times.append(ts)
+            rows.append(row)
+        _evict(times, rows, _horizon())
+
+
+def covered_since():
+    """Return the UTC datetime from which the cache holds every row, or None if inactive."""
+    with cache_lock:
+        if _active_since is None:
+            return None
+        since = max(_active_since, _horizon())
+    return ns_to_datetime(since).astimezone(pytz.UTC)
+
+
+def get_rows(start_time, end_time, symbol=None):
+    """Return cached rows with start_time <= timestamp <= end_time, ordered by timestamp."""
+    start = _to_ns(start_time)
+    end = _to_ns(end_time)
+    result = []
+    with cache_lock:
+        horizon = _horizon()
+        symbols = [symbol] if symbol else list(_cache)
+        for name in symbols:
+            if name not in _cache:
+                continue
+            times, rows = _cache[name]
+            _evict(times, rows, horizon)
+            lo = bisect.bisect_left(times, start)
+            hi = bisect.bisect_right(times, end)
+            result.extend((times[i], rows[i].copy()) for i in range(lo, hi))
+    result.sort(key=lambda item: item[0])
+    return [row for _, row in result]
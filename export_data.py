@@ -0,0 +1,219 @@
+import argparse
+import logging
+import os
+import time
+from datetime import datetime
+
+import mysql.connector
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from compaction import LAST_COLUMNS, MEAN_COLUMNS, ROLLUP_TABLES, load_watermark
+
+# Configure logging for export_data.py
+logger = logging.getLogger("export_data")
+logger.setLevel(logging.INFO)
+
+# File handler for export_data.log
+fh = logging.FileHandler('export_data.log')
+fh.setLevel(logging.INFO)
+formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+fh.setFormatter(formatter)
+logger.addHandler(fh)
+
+# Stream handler for console output
+sh = logging.StreamHandler()
+sh.setLevel(logging.INFO)
+sh.setFormatter(formatter)
+logger.addHandler(sh)
+
+# Database configuration
+DB_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "admin",
+    "database": "trading_db"
+}
+
+# Rows fetched from the server and written as one Parquet row group; bounds memory use
+CHUNK_ROWS = 50_000
+
+_DECIMAL = pa.decimal128(20, 8)
+
+# pi_trades column -> (type MySQL rows are read as, type written to the file)
+EXPORT_SCHEMA = {
+    'timestamp': (pa.timestamp('us'), pa.timestamp('us', tz='UTC')),
+    'timestamp_ns': (pa.int64(), pa.int64()),
+    'symbol': (pa.string(), pa.string()),
+    'current_price': (_DECIMAL, pa.float64()),
+    'trend': (pa.string(), pa.string()),
+    'buy_score': (pa.int32(), pa.int32()),
+    'sell_score': (pa.int32(), pa.int32()),
+    'hold_score': (pa.int32(), pa.int32()),
+    'ma5': (_DECIMAL, pa.float64()),
+    'ma10': (_DECIMAL, pa.float64()),
+    'ma15': (_DECIMAL, pa.float64()),
+    'ma30': (_DECIMAL, pa.float64()),
+    'macd': (_DECIMAL, pa.float64()),
+    'macd_signal': (_DECIMAL, pa.float64()),
+    'macd_diff': (_DECIMAL, pa.float64()),
+    'volume': (_DECIMAL, pa.float64()),
+    'rsi': (_DECIMAL, pa.float64()),
+    'bb_upper': (_DECIMAL, pa.float64()),
+    'bb_middle': (_DECIMAL, pa.float64()),
+    'bb_lower': (_DECIMAL, pa.float64()),
+    'stoch_k': (_DECIMAL, pa.float64()),
+    'stoch_d': (_DECIMAL, pa.float64()),
+    'vwap': (_DECIMAL, pa.float64()),
+    'spread': (_DECIMAL, pa.float64()),
+    'imbalance': (_DECIMAL, pa.float64()),
+    'processing_time': (pa.decimal128(10, 4), pa.float64()),
+}
+FILE_SCHEMA = pa.schema([(name, types[1]) for name, types in EXPORT_SCHEMA.items()])
+
+_UTC_TIME = (pa.timestamp('us'), pa.timestamp('us', tz='UTC'))
+# pi_trades_1m / pi_trades_1h column -> (read type, file type), for ranges compaction already rolled up
+ROLLUP_EXPORT_SCHEMA = {
+    'bucket_start': _UTC_TIME,
+    'symbol': (pa.string(), pa.string()),
+    'open': (_DECIMAL, pa.float64()),
+    'high': (_DECIMAL, pa.float64()),
+    'low': (_DECIMAL, pa.float64()),
+    'close': (_DECIMAL, pa.float64()),
+    'row_count': (pa.int32(), pa.int32()),
+    'open_time': _UTC_TIME,
+    'close_time': _UTC_TIME,
+    **{
+        column: (pa.string(), pa.string()) if column == 'trend' else
+        (pa.int32(), pa.int32()) if column.endswith('_score') else
+        (_DECIMAL, pa.float64())
+        for column in LAST_COLUMNS + MEAN_COLUMNS
+    },
+}
+# --rollup choice -> table
+ROLLUP_CHOICES = {'1m': 'pi_trades_1m', '1h': 'pi_trades_1h'}
+
+
+def _to_batch(rows, schema=EXPORT_SCHEMA, file_schema=FILE_SCHEMA):
+    """Turn a list of row tuples into a record batch, converting one whole column at a time."""
+    arrays = []
+    for (name, (read_type, file_type)), column in zip(schema.items(), zip(*rows)):
+        array = pa.array(column, type=read_type)
+        if pa.types.is_timestamp(file_type) and file_type.tz:
+            # DATETIME values come back naive but are stored as UTC
+            array = array.cast(pa.int64()).view(file_type)
+        elif read_type != file_type:
+            array = array.cast(file_type)
+        arrays.append(array)
+    return pa.RecordBatch.from_arrays(arrays, schema=file_schema)
+
+
+def _stream_to_parquet(conn, query, params, output_path, schema, chunk_rows):
+    """Run query through an unbuffered cursor and write the rows to output_path; returns the row count."""
+    file_schema = pa.schema([(name, types[1]) for name, types in schema.items()])
+    cursor = conn.cursor(buffered=False)
+    written = 0
+    start = time.time()
+    try:
+        cursor.execute(query, params)
+        with pq.ParquetWriter(output_path, file_schema, compression='zstd') as writer:
+            while True:
+                rows = cursor.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                writer.write_batch(_to_batch(rows, schema, file_schema))
+                written += len(rows)
+                logger.info(f"Exported {written} rows to {output_path} ({time.time() - start:.1f}s)")
+            if written == 0:
+                # Still write a valid, empty file with the schema
+                writer.write_table(file_schema.empty_table())
+    finally:
+        cursor.close()
+    return written
+
+
+def _symbol_filter(symbols, params):
+    if not symbols:
+        return ""
+    params.extend(symbols)
+    return f" AND symbol IN ({', '.join(['%s'] * len(symbols))})"
+
+
+def _compaction_watermark(conn):
+    """Raw pi_trades rows before this time were rolled up and deleted (None if compaction never ran)."""
+    cursor = conn.cursor()
+    try:
+        return load_watermark(cursor)
+    except mysql.connector.Error:
+        return None  # Compaction has not run against this database yet
+    finally:
+        cursor.close()
+
+
+def rollup_output_path(output_path, rollup):
+    """File the rolled-up part of a range goes to: data.parquet -> data.1m.parquet."""
+    root, extension = os.path.splitext(output_path)
+    return f"{root}.{rollup}{extension or '.parquet'}"
+
+
+def export_range(start_time, end_time, output_path, symbols=None, chunk_rows=CHUNK_ROWS, rollup=None):
+    """Stream pi_trades rows with start_time <= timestamp < end_time to a Parquet file.
+
+    Rows are read through an unbuffered cursor, so the server streams the result and at
+    most chunk_rows rows are held in memory at once. Raw rows older than the compaction
+    watermark no longer exist; that part of the range is logged as a warning, or with
+    rollup='1m'/'1h' exported from pi_trades_1m/pi_trades_1h to rollup_output_path().
+    Returns the number of raw rows written to output_path.
+    """
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        raw_start = start_time
+        watermark = _compaction_watermark(conn)
+        if watermark is not None and start_time < watermark:
+            compacted_end = min(end_time, watermark)
+            if rollup:
+                table = ROLLUP_CHOICES[rollup]
+                rollup_path = rollup_output_path(output_path, rollup)
+                params = [start_time, compacted_end]
+                query = (
+                    f"SELECT {', '.join(ROLLUP_EXPORT_SCHEMA)} FROM {table} "
+                    f"WHERE bucket_start >= %s AND bucket_start < %s{_symbol_filter(symbols, params)} "
+                    "ORDER BY bucket_start ASC, symbol ASC"
+                )
+                buckets = _stream_to_parquet(conn, query, params, rollup_path, ROLLUP_EXPORT_SCHEMA, chunk_rows)
+                logger.info(f"Exported {buckets} {table} buckets from {start_time} to {compacted_end} in {rollup_path}")
+            else:
+                logger.warning(
+                    f"Raw rows before {watermark} were compacted: {start_time} to {compacted_end} is only "
+                    f"in {' and '.join(ROLLUP_TABLES)} and will be missing from {output_path} (use --rollup 1m or 1h)"
+                )
+            raw_start = max(start_time, watermark)
+
+        if raw_start < end_time:
+            params = [raw_start, end_time]
+            query = (
+                f"SELECT {', '.join(EXPORT_SCHEMA)} FROM pi_trades WHERE timestamp >= %s AND timestamp < %s"
+                f"{_symbol_filter(symbols, params)} ORDER BY timestamp ASC, id ASC"
+            )
+        else:
+            # The whole range is compacted: still write a valid, empty file with the schema
+            params = []
+            query = f"SELECT {', '.join(EXPORT_SCHEMA)} FROM pi_trades WHERE FALSE"
+        written = _stream_to_parquet(conn, query, params, output_path, EXPORT_SCHEMA, chunk_rows)
+    finally:
+        conn.close()
+    logger.info(f"Export finished: {written} rows from {start_time} to {end_time} in {output_path}")
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a time range of pi_trades to a Parquet file.")
+    parser.add_argument("start", type=datetime.fromisoformat, help="Start time (UTC, ISO format, inclusive)")
+    parser.add_argument("end", type=datetime.fromisoformat, help="End time (UTC, ISO format, exclusive)")
+    parser.add_argument("output", help="Output .parquet file")
+    parser.add_argument("--symbol", action="append", dest="symbols", help="Symbol to export (repeatable, default: all)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="Rows per fetch and row group")
+    parser.add_argument("--rollup", choices=sorted(ROLLUP_CHOICES),
+                        help="Export the already compacted part of the range from this rollup table to OUTPUT.<rollup>.parquet")
+    args = parser.parse_args()
+    export_range(args.start, args.end, args.output, args.symbols, args.chunk_rows, args.rollup)
@@ -0,0 +1,146 @@
+import argparse
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+
+from mock_coinapi_server import MockCoinAPIServer, synthetic_symbols
+import websocket_trades
+from websocket_trades import run_websocket, trade_queue, gap_stats
+
+# Configure logging for failover_check.py
+logger = logging.getLogger("failover_check")
+logger.setLevel(logging.INFO)
+
+# File handler for failover_check.log
+fh = logging.FileHandler('failover_check.log')
+fh.setLevel(logging.INFO)
+formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+fh.setFormatter(formatter)
+logger.addHandler(fh)
+
+# Stream handler for console output
+sh = logging.StreamHandler()
+sh.setLevel(logging.INFO)
+sh.setFormatter(formatter)
+logger.addHandler(sh)
+
+TRADE_RATE = 50
+# Redundant connections to run; the check needs at least two
+CONNECTIONS = 2
+NUM_SYMBOLS = 3
+# Time the stream runs before, between and after the drops
+PHASE_SECONDS = 3
+# Longest wait for all connections to (re)subscribe
+CONNECT_TIMEOUT_SECONDS = 10
+
+
+class RecordingServer(MockCoinAPIServer):
+    """Mock server that remembers the uuid of every trade it sent to at least one client."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.sent_uuids = []
+
+    def broadcast(self, message):
+        sent_before = self.sent[message.get("type")]
+        super().broadcast(message)
+        if message.get("type") == "trade" and self.sent["trade"] > sent_before:
+            self.sent_uuids.append(message["uuid"])
+
+
+def _collect(received):
+    """Stand in for the processing thread: record the uuid of every trade that reaches trade_queue."""
+    while True:
+        kind, data = trade_queue.get()
+        if kind == "trade":
+            received.append(data["uuid"])
+
+
+def _wait_for_clients(server, count):
+    deadline = time.monotonic() + CONNECT_TIMEOUT_SECONDS
+    while server.client_count() < count and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return server.client_count() >= count
+
+
+def run_failover_check(rate=TRADE_RATE, num_symbols=NUM_SYMBOLS, phase_seconds=PHASE_SECONDS, connections=CONNECTIONS):
+    """Drop one connection, then all of them, and check what reached trade_queue.
+
+    Every trade must arrive at most once, none may go missing while one connection stays up,
+    the full drop must count as an outage and its pending gap report must be cleared once every
+    symbol traded again. Returns the list of failures (empty when the check passed).
+    """
+    if connections < 2:
+        raise ValueError("The failover check needs at least two connections")
+    websocket_trades.WS_CONNECTIONS = connections
+    symbols = synthetic_symbols(num_symbols) if num_symbols > 1 else None
+    server = RecordingServer(port=0, rate=rate, symbols=symbols).start()
+    websocket_trades.WS_URL = server.url
+    received = []
+    threading.Thread(target=run_websocket, daemon=True, name="WebSocketThread").start()
+    threading.Thread(target=_collect, args=(received,), daemon=True, name="TradeCollector").start()
+
+    failures = []
+    if not _wait_for_clients(server, websocket_trades.WS_CONNECTIONS):
+        failures.append(f"only {server.client_count()} of {websocket_trades.WS_CONNECTIONS} connections subscribed")
+    time.sleep(phase_seconds)
+
+    # One connection lost: the others keep the stream complete
+    outages_before = gap_stats['outages']
+    partial_start = len(server.sent_uuids)
+    server.drop_connections(1)
+    time.sleep(phase_seconds)
+    partial_end = len(server.sent_uuids)
+    if gap_stats['outages'] != outages_before:
+        failures.append("dropping one connection was counted as an outage")
+    if not _wait_for_clients(server, websocket_trades.WS_CONNECTIONS):
+        failures.append("dropped connection did not come back")
+
+    # All connections lost: trades sent in between are gone, the outage must be counted
+    server.drop_connections()
+    if not _wait_for_clients(server, 1):
+        failures.append("no connection came back after dropping all of them")
+    time.sleep(phase_seconds)
+    if gap_stats['outages'] != outages_before + 1:
+        failures.append(f"expected one outage after dropping all connections, counted {gap_stats['outages'] - outages_before}")
+
+    server.rate = 0
+    time.sleep(1)
+    server.stop()
+
+    counts = Counter(received)
+    duplicates = sum(1 for count in counts.values() if count > 1)
+    unknown = len(set(counts) - set(server.sent_uuids))
+    missing_partial = sum(1 for uuid in server.sent_uuids[partial_start:partial_end] if uuid not in counts)
+    missing = sum(1 for uuid in server.sent_uuids if uuid not in counts)
+    if duplicates:
+        failures.append(f"{duplicates} trade(s) reached trade_queue more than once")
+    if unknown:
+        failures.append(f"{unknown} trade(s) reached trade_queue that the server never sent")
+    if missing_partial:
+        failures.append(f"{missing_partial} trade(s) lost while one connection was still up")
+    if websocket_trades._pending_outage is not None:
+        failures.append("gap report of the outage is still pending after every symbol traded again")
+
+    logger.info(
+        f"Sent {len(server.sent_uuids)} trades, received {len(received)} ({len(counts)} unique), "
+        f"{missing} lost in the full outage; gap stats {gap_stats}"
+    )
+    for failure in failures:
+        logger.error(f"FAILED: {failure}")
+    if not failures:
+        logger.info("Failover check passed")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check deduplication and outage accounting of the redundant websocket connections.")
+    parser.add_argument("--rate", type=float, default=TRADE_RATE, help="Trades per second across all symbols")
+    parser.add_argument("--num-symbols", type=int, default=NUM_SYMBOLS)
+    parser.add_argument("--phase-seconds", type=float, default=PHASE_SECONDS)
+    parser.add_argument("--connections", type=int, default=CONNECTIONS, help="Redundant connections (at least 2)")
+    args = parser.parse_args()
+    logging.getLogger("websocket_trades").setLevel(logging.WARNING)
+    sys.exit(1 if run_failover_check(args.rate, args.num_symbols, args.phase_seconds, args.connections) else 0)
@@ -6,6 +6,8 @@ from datetime import datetime, timedelta
 
 import pytz
 
+from data_cache import covered_since, get_rows
+
 # Configure logging for fetch_data.py
 logger = logging.getLogger("fetch_data")
 logger.setLevel(logging.INFO)
@@ -31,44 +33,60 @@ DB_CONFIG = {
     "database": "trading_db"
 }
 
-def fetch_data():
+def _fetch_from_mysql(start_time, end_time, include_end=True):
+    """Read pi_trades rows from start_time up to end_time (exclusive when include_end is False)."""
+    # Connect to MySQL
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor(dictionary=True)
+
+    # Query the pi_trades table
+    end_op = "<=" if include_end else "<"
+    query = f"""
+    SELECT timestamp, timestamp_ns, current_price, symbol, trend, buy_score, sell_score, hold_score,
+        ma5, ma10, ma15, ma30, macd, macd_signal, macd_diff, volume, rsi,
+        bb_upper, bb_middle, bb_lower, stoch_k, stoch_d, vwap, spread, imbalance
+    FROM pi_trades
+    WHERE timestamp >= %s AND timestamp {end_op} %s
+    ORDER BY timestamp ASC, timestamp_ns ASC
+    """
+    cursor.execute(query, (start_time, end_time))
+
+    # Fetch all rows
+    data = cursor.fetchall()
+    logger.info(f"Retrieved {len(data)} rows from MySQL")
+    for row in data:
+        if isinstance(row['timestamp'], datetime):
+            row['timestamp'] = row['timestamp'].isoformat()
+        for key in row:
+            if isinstance(row[key], Decimal):
+                row[key] = float(row[key])
+    # Close connection
+    cursor.close()
+    conn.close()
+    return data
+
+def fetch_data(start_time=None, end_time=None):
     try:
-        # Connect to MySQL
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor(dictionary=True)
-        
-        # Define time range (last 5 minutes)
-        end_time = datetime.now(pytz.UTC)
-        start_time = end_time - timedelta(minutes=1)
-        
-        # Query the pi_trades table
-        query = """
-        SELECT timestamp, current_price, symbol, trend, buy_score, sell_score, hold_score,
-            ma5, ma10, ma15, ma30, macd, macd_signal, macd_diff, volume, rsi,
-            bb_upper, bb_middle, bb_lower, stoch_k, stoch_d, vwap, spread, imbalance
-        FROM pi_trades
-        WHERE timestamp BETWEEN %s AND %s
-        ORDER BY timestamp ASC
-        """
-        cursor.execute(query, (start_time, end_time))
-        
-        # Fetch all rows
-        data = cursor.fetchall()
-        logger.info(f"Retrieved {len(data)} rows")
-        for row in data:
-            if isinstance(row['timestamp'], datetime):
-                row['timestamp'] = row['timestamp'].isoformat()
-            for key in row:
-                if isinstance(row[key], Decimal):
-                    row[key] = float(row[key])    
-        # Close connection
-        cursor.close()
-        conn.close()
-        
+        # Define time range (last minute by default)
+        end_time = end_time or datetime.now(pytz.UTC)
+        start_time = start_time or end_time - timedelta(minutes=1)
+
+        # Recent rows come from the in-process read cache; MySQL only serves what it does not cover
+        cached_from = covered_since()
+        data = []
+        if cached_from is None or end_time < cached_from:
+            data = _fetch_from_mysql(start_time, end_time)
+        else:
+            if start_time < cached_from:
+                data = _fetch_from_mysql(start_time, cached_from, include_end=False)
+            cached = get_rows(max(start_time, cached_from), end_time)
+            logger.info(f"Retrieved {len(cached)} rows from read cache")
+            data.extend(cached)
+
         # Save to JSON file
         with open("recent_data.json", "w") as f:
             json.dump(data, f)
-        logger.info(f"Fetched {len(data)} records from MySQL and saved to recent_data.json")
+        logger.info(f"Fetched {len(data)} records and saved to recent_data.json")
     except Exception as e:
         logger.error(f"Error fetching data: {e}")
 
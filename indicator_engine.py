@@ -0,0 +1,203 @@
+import json
+import logging
+import os
+
+import numpy as np
+
+# Configure logging for indicator_engine.py
+logger = logging.getLogger("indicator_engine")
+logger.setLevel(logging.INFO)
+
+# File handler for indicator_engine.log
+fh = logging.FileHandler('indicator_engine.log')
+fh.setLevel(logging.INFO)
+formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+fh.setFormatter(formatter)
+logger.addHandler(fh)
+
+# Stream handler for console output
+sh = logging.StreamHandler()
+sh.setLevel(logging.INFO)
+sh.setFormatter(formatter)
+logger.addHandler(sh)
+
+# Indicators this deployment runs, as (registry name, parameters).
+# Override with a JSON file: {"indicators": [{"name": "sma", "window": 5}, ...], "sinks": ["storage"]}
+ACTIVE_INDICATORS = [
+    ('sma', {'window': 5}),
+    ('sma', {'window': 10}),
+    ('sma', {'window': 15}),
+    ('sma', {'window': 30}),
+    ('macd', {'fast': 12, 'slow': 26, 'signal': 9}),
+    ('volume', {}),
+    ('rsi', {'window': 14}),
+    ('bollinger', {'window': 20, 'dev': 2}),
+    ('stochastic', {'window': 14, 'smooth': 3}),
+    ('vwap', {}),
+]
+ACTIVE_SINKS = ['recommendations', 'storage']
+INDICATOR_CONFIG_FILE = os.environ.get('INDICATOR_CONFIG', 'indicator_config.json')
+
+# Frame column -> latest_data / pi_trades key for every stored indicator value
+STORAGE_KEYS = {
+    'MA5': 'ma5', 'MA10': 'ma10', 'MA15': 'ma15', 'MA30': 'ma30',
+    'MACD': 'macd', 'MACD_signal': 'macd_signal', 'MACD_diff': 'macd_diff',
+    'Volume': 'volume', 'RSI': 'rsi',
+    'BB_upper': 'bb_upper', 'BB_middle': 'bb_middle', 'BB_lower': 'bb_lower',
+    'Stoch_K': 'stoch_k', 'Stoch_D': 'stoch_d', 'VWAP': 'vwap'
+}
+
+# Columns each consumer reads; an indicator none of the active sinks reads is not computed
+SINK_COLUMNS = {
+    'recommendations': ['RSI', 'MACD_diff', 'BB_lower', 'BB_upper', 'Stoch_K', 'MA5', 'MA10'],
+    'storage': list(STORAGE_KEYS),
+}
+
+
+class IndicatorContext:
+    """Dependency graph of intermediate series for one frame.
+
+    Every node is keyed by what it computes and built on first request, so indicators
+    that share an input (a rolling mean, an EMA, a cumulative sum) compute it once.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        self._nodes = {}
+
+    def node(self, key, build):
+        if key not in self._nodes:
+            self._nodes[key] = build()
+        return self._nodes[key]
+
+    def price(self):
+        return self.node(('price',), lambda: self.df['price'])
+
+    def rolling_mean(self, window):
+        return self.node(('mean', window), lambda: self.price().rolling(window=window, min_periods=window).mean())
+
+    def rolling_std(self, window):
+        return self.node(('std', window), lambda: self.price().rolling(window=window, min_periods=window).std(ddof=0))
+
+    def rolling_min(self, window):
+        return self.node(('min', window), lambda: self.price().rolling(window=window, min_periods=window).min())
+
+    def rolling_max(self, window):
+        return self.node(('max', window), lambda: self.price().rolling(window=window, min_periods=window).max())
+
+    def ema(self, span):
+        return self.node(('ema', span), lambda: self.price().ewm(span=span, min_periods=span, adjust=False).mean())
+
+    def price_diff(self):
+        return self.node(('diff',), lambda: self.price().diff(1))
+
+    def cum_size(self):
+        return self.node(('cum_size',), lambda: self.df['size'].cumsum())
+
+    def cum_notional(self):
+        return self.node(('cum_notional',), lambda: (self.price() * self.df['size']).cumsum())
+
+
+# Registry: name -> (function(params) -> output columns, function(ctx, params) -> {column: series})
+INDICATORS = {}
+
+
+def register_indicator(name, outputs):
+    """Register an indicator; outputs maps its parameters to the frame columns it writes."""
+    def decorator(compute):
+        INDICATORS[name] = (outputs, compute)
+        return compute
+    return decorator
+
+
+@register_indicator('sma', lambda p: [f"MA{p['window']}"])
+def _sma(ctx, p):
+    return {f"MA{p['window']}": ctx.rolling_mean(p['window'])}
+
+
+@register_indicator('macd', lambda p: ['MACD', 'MACD_signal', 'MACD_diff'])
+def _macd(ctx, p):
+    macd = ctx.node(('macd', p['fast'], p['slow']), lambda: ctx.ema(p['fast']) - ctx.ema(p['slow']))
+    signal = macd.ewm(span=p['signal'], min_periods=p['signal'], adjust=False).mean()
+    return {'MACD': macd, 'MACD_signal': signal, 'MACD_diff': macd - signal}
+
+
+@register_indicator('volume', lambda p: ['Volume'])
+def _volume(ctx, p):
+    return {'Volume': ctx.cum_size()}
+
+
+@register_indicator('rsi', lambda p: ['RSI'])
+def _rsi(ctx, p):
+    window = p['window']
+    diff = ctx.price_diff()
+    up = diff.where(diff > 0, 0.0).ewm(alpha=1 / window, min_periods=window, adjust=False).mean()
+    down = (-diff.where(diff < 0, 0.0)).ewm(alpha=1 / window, min_periods=window, adjust=False).mean()
+    rsi = 100 - 100 / (1 + up / down)
+    return {'RSI': rsi.where(down != 0, 100)}
+
+
+@register_indicator('bollinger', lambda p: ['BB_upper', 'BB_middle', 'BB_lower'])
+def _bollinger(ctx, p):
+    middle = ctx.rolling_mean(p['window'])
+    band = p['dev'] * ctx.rolling_std(p['window'])
+    return {'BB_upper': middle + band, 'BB_middle': middle, 'BB_lower': middle - band}
+
+
+@register_indicator('stochastic', lambda p: ['Stoch_K', 'Stoch_D'])
+def _stochastic(ctx, p):
+    low = ctx.rolling_min(p['window'])
+    high = ctx.rolling_max(p['window'])
+    stoch_k = 100 * (ctx.price() - low) / (high - low)
+    stoch_d = stoch_k.rolling(window=p['smooth'], min_periods=p['smooth']).mean()
+    return {'Stoch_K': stoch_k, 'Stoch_D': stoch_d}
+
+
+@register_indicator('vwap', lambda p: ['VWAP'])
+def _vwap(ctx, p):
+    return {'VWAP': ctx.cum_notional() / ctx.cum_size()}
+
+
+def build_plan(indicators, sinks):
+    """Return the (name, compute, params) entries whose outputs an active sink consumes."""
+    consumed = set()
+    for sink in sinks:
+        if sink not in SINK_COLUMNS:
+            raise ValueError(f"Unknown indicator sink: {sink}")
+        consumed.update(SINK_COLUMNS[sink])
+    plan = []
+    for name, params in indicators:
+        if name not in INDICATORS:
+            raise ValueError(f"Unknown indicator: {name}")
+        outputs, compute = INDICATORS[name]
+        if consumed.intersection(outputs(params)):
+            plan.append((name, compute, params))
+        else:
+            logger.info(f"Skipping indicator {name} {params}: no active sink consumes it")
+    return plan
+
+
+def load_config(path=INDICATOR_CONFIG_FILE):
+    """Read the deployment's indicator and sink selection, falling back to the defaults above."""
+    if not os.path.exists(path):
+        return ACTIVE_INDICATORS, ACTIVE_SINKS
+    with open(path, "r") as f:
+        config = json.load(f)
+    indicators = [
+        (entry['name'], {key: value for key, value in entry.items() if key != 'name'})
+        for entry in config.get('indicators', [])
+    ] or ACTIVE_INDICATORS
+    logger.info(f"Loaded indicator configuration from {path}")
+    return indicators, config.get('sinks', ACTIVE_SINKS)
+
+
+indicator_plan = build_plan(*load_config())
+
+
+def compute_indicators(df, plan=None):
+    """Add the planned indicator columns to a price/size frame (NaN warm-up values become 0.0)."""
+    ctx = IndicatorContext(df)
+    for name, compute, params in (indicator_plan if plan is None else plan):
+        for column, series in compute(ctx, params).items():
+            df[column] = series.replace([np.inf, -np.inf], np.nan).fillna(0.0)
+    return df
@@ -0,0 +1,216 @@
+import argparse
+import json
+import logging
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from mock_coinapi_server import MockCoinAPIServer, recorded_trade_rate, synthetic_symbols
+import websocket_trades
+from websocket_trades import run_websocket, trade_queue
+from scheduler import compute_scheduler
+import web_dashboard
+from spool import Spool
+from web_dashboard import process_trades
+
+# Configure logging for load_test.py
+logger = logging.getLogger("load_test")
+logger.setLevel(logging.INFO)
+
+# File handler for load_test.log
+fh = logging.FileHandler('load_test.log')
+fh.setLevel(logging.INFO)
+formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+fh.setFormatter(formatter)
+logger.addHandler(fh)
+
+# Stream handler for console output
+sh = logging.StreamHandler()
+sh.setLevel(logging.INFO)
+sh.setFormatter(formatter)
+logger.addHandler(sh)
+
+# Trade rates (messages per second) stepped through until the pipeline falls behind
+DEFAULT_RATES = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+STEP_SECONDS = 15
+# A step is sustained if the backlog grew by less than this share of the messages sent ...
+MAX_BACKLOG_GROWTH = 0.05
+# ... and the p99 tick-to-indicator latency of hot symbols stayed under this budget
+LATENCY_BUDGET_MS = 1000
+# Time allowed for the backlog to drain between steps
+DRAIN_TIMEOUT_SECONDS = 30
+# How often the latency probe looks for new rows in the spool
+PROBE_INTERVAL_SECONDS = 0.01
+REPORT_FILE = 'load_test_report.json'
+
+# (priority, latency ms) of each new indicator row, measured from the exchange time the mock stamps at send
+_latencies = []
+_latencies_lock = threading.Lock()
+
+
+def _measure_rows(spool, stop):
+    """Stand in for the spool drain: time every spooled indicator row that reflects a new trade."""
+    last_seen = {}
+    checkpoint = spool.committed_seq
+    while not stop.is_set():
+        records = spool.read(checkpoint, 1000)
+        if not records:
+            stop.wait(PROBE_INTERVAL_SECONDS)
+            continue
+        now = time.time_ns()
+        for _, row in records:
+            if last_seen.get(row['symbol']) == row['timestamp']:
+                continue  # Recompute of a trade already measured
+            last_seen[row['symbol']] = row['timestamp']
+            with _latencies_lock:
+                _latencies.append((compute_scheduler.policy(row['symbol'])[0], (now - row['timestamp']) / 1e6))
+        checkpoint = records[-1][0]
+        spool.commit(checkpoint)
+
+
+def _quiet_console():
+    """Per-trade console logging would dominate the measurement; keep it in the log files only."""
+    for name in ("websocket_trades", "web_dashboard", "signal_events", "orderbook_store", "indicator_engine", "scheduler"):
+        for handler in logging.getLogger(name).handlers:
+            if type(handler) is logging.StreamHandler:
+                handler.setLevel(logging.WARNING)
+
+
+def _percentiles(values):
+    if not values:
+        return {'p50': None, 'p90': None, 'p99': None, 'max': None}
+    p50, p90, p99 = (float(value) for value in np.percentile(values, [50, 90, 99]))
+    return {'p50': round(p50, 2), 'p90': round(p90, 2), 'p99': round(p99, 2), 'max': round(max(values), 2)}
+
+
+def _wait_for_drain(timeout):
+    deadline = time.monotonic() + timeout
+    while trade_queue.qsize() and time.monotonic() < deadline:
+        time.sleep(0.1)
+    return trade_queue.qsize() == 0
+
+
+def run_load_test(rates=DEFAULT_RATES, step_seconds=STEP_SECONDS, symbols=None, book_rate=0.0,
+                  burst_every=0, burst_duration=1.0, burst_multiplier=10.0, replay_path=None,
+                  latency_budget_ms=LATENCY_BUDGET_MS, report_file=REPORT_FILE):
+    """Drive websocket ingestion and indicator computation from the local mock at increasing rates.
+
+    With replay_path, each rate is reached by speeding the recording up or down relative to
+    its own trade rate. Rows are spooled to a temporary directory that a latency probe reads
+    instead of MySQL, so the result is the ceiling of the ingest -> indicator -> spool path
+    without MySQL. Returns the report dict (also written to report_file).
+    """
+    recorded_rate = None
+    if replay_path:
+        recorded_rate = recorded_trade_rate(replay_path)
+        if recorded_rate is None:
+            raise ValueError(f"{replay_path} has no timestamped trades to pace a replay by")
+        logger.info(f"Recording {replay_path} runs at {recorded_rate:.1f} trades/s at its original pace")
+    spool_dir = tempfile.mkdtemp(prefix="load_test_spool_")
+    web_dashboard.row_spool = spool = Spool(spool_dir)
+    server = MockCoinAPIServer(
+        port=0, symbols=symbols, rate=rates[0], book_rate=book_rate,
+        burst_every=burst_every, burst_duration=burst_duration, burst_multiplier=burst_multiplier,
+        replay_path=replay_path, replay_speed=rates[0] / recorded_rate if recorded_rate else 1.0
+    ).start()
+    websocket_trades.WS_URL = server.url
+    for target, name in ((run_websocket, "WebSocketThread"), (process_trades, "TradeProcessingThread")):
+        threading.Thread(target=target, daemon=True, name=name).start()
+    probe_stop = threading.Event()
+    probe = threading.Thread(target=_measure_rows, args=(spool, probe_stop), daemon=True, name="LatencyProbe")
+    probe.start()
+
+    deadline = time.monotonic() + 10
+    while server.client_count() < websocket_trades.WS_CONNECTIONS and time.monotonic() < deadline:
+        time.sleep(0.1)
+    logger.info(f"Mock server at {server.url} with {server.client_count()} connection(s); warming up")
+    time.sleep(5)
+    _wait_for_drain(DRAIN_TIMEOUT_SECONDS)
+
+    steps = []
+    for rate in rates:
+        server.rate = rate
+        if recorded_rate:
+            server.replay_speed = rate / recorded_rate
+        with _latencies_lock:
+            _latencies.clear()
+        sent_before = sum(server.sent[kind] for kind in ("trade", "book50"))
+        backlog_before = trade_queue.qsize()
+        time.sleep(step_seconds)
+        sent = sum(server.sent[kind] for kind in ("trade", "book50")) - sent_before
+        growth = trade_queue.qsize() - backlog_before
+        with _latencies_lock:
+            samples = list(_latencies)
+        latency = _percentiles([ms for _, ms in samples])
+        # Cold symbols are recomputed once per interval on purpose; freshness is judged on the hot ones
+        hot_latency = _percentiles([ms for priority, ms in samples if priority == 'hot']) if any(
+            priority == 'hot' for priority, _ in samples) else latency
+        step = {
+            'target_rate': rate,
+            'replay_speed': float(f"{server.replay_speed:.4g}") if recorded_rate else None,
+            'sent_per_second': round(sent / step_seconds, 1),
+            'processed_per_second': round((sent - growth) / step_seconds, 1),
+            'backlog_growth': growth,
+            'latency_ms': latency,
+            'hot_latency_ms': hot_latency,
+            'gap_stats': dict(websocket_trades.gap_stats),
+            'scheduler': {key: value for key, value in compute_scheduler.get_metrics().items() if key != 'symbols'},
+        }
+        step['sustained'] = (
+            growth <= MAX_BACKLOG_GROWTH * max(sent, 1)
+            and hot_latency['p99'] is not None and hot_latency['p99'] <= latency_budget_ms
+        )
+        steps.append(step)
+        logger.info(
+            f"rate {rate}/s: sent {step['sent_per_second']}/s, processed {step['processed_per_second']}/s, "
+            f"backlog +{growth}, latency p50 {latency['p50']}ms p99 {latency['p99']}ms (hot p99 {hot_latency['p99']}ms)"
+            f"{'' if step['sustained'] else ' -> NOT sustained'}"
+        )
+        if not step['sustained']:
+            break
+        if not _wait_for_drain(DRAIN_TIMEOUT_SECONDS):
+            logger.warning("Backlog did not drain between steps; stopping")
+            break
+
+    server.stop()
+    # The probe must be done reading before its spool directory goes away
+    probe_stop.set()
+    probe.join()
+    shutil.rmtree(spool_dir, ignore_errors=True)
+    sustained = [step for step in steps if step['sustained']]
+    report = {
+        'symbols': len(server.symbols),
+        'book_rate_per_symbol': book_rate,
+        'step_seconds': step_seconds,
+        'latency_budget_ms': latency_budget_ms,
+        'max_sustained_per_second': max((step['processed_per_second'] for step in sustained), default=0),
+        'steps': steps,
+    }
+    with open(report_file, "w") as f:
+        json.dump(report, f, indent=4)
+    logger.info(f"Max sustained throughput: {report['max_sustained_per_second']} msg/s (report in {report_file})")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find the sustained throughput of the ingest -> indicator pipeline.")
+    parser.add_argument("--rates", type=float, nargs="+", default=DEFAULT_RATES, help="Trade rates to step through")
+    parser.add_argument("--step-seconds", type=float, default=STEP_SECONDS)
+    parser.add_argument("--num-symbols", type=int, default=1)
+    parser.add_argument("--book-rate", type=float, default=0.0, help="book50 updates per second per symbol")
+    parser.add_argument("--burst-every", type=float, default=0)
+    parser.add_argument("--burst-duration", type=float, default=1.0)
+    parser.add_argument("--burst-multiplier", type=float, default=10.0)
+    parser.add_argument("--replay", help="Replay recorded CoinAPI messages instead of synthetic trades")
+    parser.add_argument("--latency-budget-ms", type=float, default=LATENCY_BUDGET_MS)
+    parser.add_argument("--report", default=REPORT_FILE)
+    parser.add_argument("--verbose", action="store_true", help="Keep per-trade console logging")
+    args = parser.parse_args()
+    if not args.verbose:
+        _quiet_console()
+    symbols = synthetic_symbols(args.num_symbols) if args.num_symbols > 1 else None
+    run_load_test(args.rates, args.step_seconds, symbols, args.book_rate, args.burst_every,
+                  args.burst_duration, args.burst_multiplier, args.replay, args.latency_budget_ms, args.report)
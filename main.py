@@ -1,12 +1,24 @@
 import time
 import threading
 import logging
-from websocket_trades import run_websocket
-from web_dashboard import process_trades
-from mysql_storage import process_mysql
+import os
+import sys
+from websocket_trades import run_websocket, trade_queue
+from web_dashboard import process_trades, trade_buffers, open_row_spool, spool_stats
+from mysql_storage import drain_spool
 from fetch_data import fetch_data  # Assuming fetch_data.py exists
 from organize_data import organize_data  # Assuming organize_data.py exists
 from send_to_n8n import send_to_n8n  # Assuming send_to_n8n.py exists
+from compaction import run_compaction
+from signal_events import enable_events, process_events, event_queue
+from profiling import install_signal_handlers, register_gauge, run_profiling_server
+from scheduler import compute_scheduler
+from orderbook_store import book_store
+from spool import SpoolLockedError
+
+# How data reaches n8n: "batch" (full window every 15s), "events" (signal-change webhooks) or "both".
+# Events need the signal webhook set up in n8n first, so they are opt-in.
+N8N_MODE = os.environ.get("N8N_MODE", "batch")
 
 # Configure logging for main.py
 logger = logging.getLogger("main")
@@ -43,24 +55,54 @@ def run_data_pipeline():
 
 def main():
     """Run all scripts together: websocket, dashboard, mysql, and data pipeline."""
+    try:
+        row_spool = open_row_spool()
+    except SpoolLockedError as e:
+        logger.error(f"{e}; is another instance of the bot running?")
+        sys.exit(1)
     # Thread for WebSocket connection
     ws_thread = threading.Thread(target=run_websocket, daemon=True, name="WebSocketThread")
     # Thread for trade processing
     trade_thread = threading.Thread(target=process_trades, daemon=True, name="TradeProcessingThread")
-    # Thread for MySQL storage
-    mysql_thread = threading.Thread(target=process_mysql, daemon=True, name="MySQLThread")
+    # Thread writing spooled rows to MySQL (keeps retrying through outages)
+    spool_drain_thread = threading.Thread(target=drain_spool, args=(row_spool,), daemon=True, name="SpoolDrainThread")
     # Thread for data pipeline (fetching, organizing, sending to n8n)
     data_pipeline_thread = threading.Thread(target=run_data_pipeline, daemon=True, name="DataPipelineThread")
+    # Thread for posting signal-change events to n8n
+    events_thread = threading.Thread(target=process_events, daemon=True, name="SignalEventThread")
+    # Thread for rolling old pi_trades rows up into minute/hour tables
+    compaction_thread = threading.Thread(target=run_compaction, daemon=True, name="CompactionThread")
+
+    # On-demand profiling: SIGUSR1/SIGUSR2 or http://127.0.0.1:PROFILING_PORT/profile/
+    register_gauge("trade_queue", trade_queue.qsize)
+    register_gauge("spool_pending", row_spool.pending)
+    register_gauge("spool_errors", lambda: dict(spool_stats))
+    register_gauge("compute_scheduler", compute_scheduler.get_metrics)
+    register_gauge("orderbook_out_of_order", lambda: book_store.out_of_order)
+    register_gauge("event_queue", event_queue.qsize)
+    register_gauge("tick_buffers", lambda: {symbol: len(buffer) for symbol, buffer in list(trade_buffers.items())})
+    # indicators.py keeps an unbounded list when it is loaded
+    register_gauge("indicators_trades", lambda: len(sys.modules["indicators"].trades) if "indicators" in sys.modules else None)
+    install_signal_handlers()
+    profiling_thread = threading.Thread(target=run_profiling_server, daemon=True, name="ProfilingThread")
 
     logger.info("Starting crypto trading bot with all components...")
     ws_thread.start()
     logger.info("WebSocket thread started")
     trade_thread.start()
     logger.info("Trade processing thread started")
-    mysql_thread.start()
-    logger.info("MySQL storage thread started")
-    data_pipeline_thread.start()
-    logger.info("Data pipeline thread started (fetch -> organize -> send to n8n)")
+    spool_drain_thread.start()
+    logger.info("Spool drain thread started")
+    if N8N_MODE in ("batch", "both"):
+        data_pipeline_thread.start()
+        logger.info("Data pipeline thread started (fetch -> organize -> send to n8n)")
+    if N8N_MODE in ("events", "both"):
+        enable_events()
+        events_thread.start()
+        logger.info("Signal event thread started (signal changes -> n8n webhook)")
+    compaction_thread.start()
+    logger.info("Compaction thread started")
+    profiling_thread.start()
 
     try:
         while True:
@@ -68,6 +110,7 @@ def main():
             logger.debug("Main thread running...")
     except KeyboardInterrupt:
         logger.info("Shutting down application...")
+        row_spool.close()
         # Threads are daemon, so they will terminate when main thread exits
     except Exception as e:
         logger.error(f"Error in main thread: {e}")
@@ -0,0 +1,400 @@
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import random
+import socket
+import struct
+import threading
+import time
+import uuid
+from collections import Counter
+
+from time_utils import parse_time_exchange
+
+# Configure logging for mock_coinapi_server.py
+logger = logging.getLogger("mock_coinapi_server")
+logger.setLevel(logging.INFO)
+
+# File handler for mock_coinapi_server.log
+fh = logging.FileHandler('mock_coinapi_server.log')
+fh.setLevel(logging.INFO)
+formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+fh.setFormatter(formatter)
+logger.addHandler(fh)
+
+# Stream handler for console output
+sh = logging.StreamHandler()
+sh.setLevel(logging.INFO)
+sh.setFormatter(formatter)
+logger.addHandler(sh)
+
+HOST = "127.0.0.1"
+PORT = 8765
+DEFAULT_SYMBOLS = ["BITGET_SPOT_PI_USDT"]
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_OP_TEXT, _OP_CLOSE, _OP_PING, _OP_PONG = 0x1, 0x8, 0x9, 0xA
+
+
+def synthetic_symbols(count):
+    """Symbol ids for a synthetic multi-symbol stream."""
+    return [f"MOCK_SPOT_SYM{index:03d}_USDT" for index in range(count)]
+
+
+def format_time(ns):
+    """CoinAPI-style timestamp: 7 fractional digits and a Z suffix."""
+    seconds, remainder = divmod(ns, 1_000_000_000)
+    return f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds))}.{remainder // 100:07d}Z"
+
+
+def recorded_trade_rate(path):
+    """Trades per second in a recording at its original pace, or None without two timestamped trades."""
+    count, first, last = 0, None, None
+    with open(path, "r") as f:
+        for line in f:
+            message = json.loads(line)
+            if message.get("type") != "trade":
+                continue
+            recorded = parse_time_exchange(message.get("time_exchange"))
+            if recorded is None:
+                continue
+            count += 1
+            first = recorded if first is None else min(first, recorded)
+            last = recorded if last is None else max(last, recorded)
+    if count < 2 or last == first:
+        return None
+    return count / ((last - first) / 1e9)
+
+
+class _Client:
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.subscribed = False
+        self.sequences = {}
+        self.send_lock = threading.Lock()
+
+    def send(self, payload, opcode=_OP_TEXT):
+        data = payload.encode() if isinstance(payload, str) else payload
+        length = len(data)
+        if length < 126:
+            header = struct.pack('!BB', 0x80 | opcode, length)
+        elif length < 65536:
+            header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+        with self.send_lock:
+            self.sock.sendall(header + data)
+
+    def next_sequence(self, message_type, symbol):
+        key = (message_type, symbol)
+        self.sequences[key] = self.sequences.get(key, 0) + 1
+        return self.sequences[key]
+
+
+class MockCoinAPIServer:
+    """Local stand-in for the CoinAPI market data websocket (hello / trade / book50 / heartbeat).
+
+    Every subscribed client receives the same trades (same uuid and time_exchange), with
+    per-connection sequence numbers like the real API. drop_connections() cuts all
+    clients off without a close handshake, to exercise reconnect and gap handling.
+    """
+
+    def __init__(self, host=HOST, port=PORT, symbols=None, rate=10.0, heartbeat_interval=1.0, book_rate=0.0,
+                 burst_every=0, burst_duration=1.0, burst_multiplier=10.0,
+                 replay_path=None, replay_speed=1.0, replay_keep_times=False, replay_loop=True):
+        self.host = host
+        self.port = port
+        self.symbols = symbols or DEFAULT_SYMBOLS
+        # Synthetic stream: trades per second across all symbols, book50 updates per second per symbol
+        self.rate = rate
+        self.book_rate = book_rate
+        self.heartbeat_interval = heartbeat_interval
+        # Every burst_every seconds the trade rate is multiplied for burst_duration seconds
+        self.burst_every = burst_every
+        self.burst_duration = burst_duration
+        self.burst_multiplier = burst_multiplier
+        # Replay of recorded messages instead of the synthetic stream
+        self.replay_path = replay_path
+        self.replay_speed = replay_speed
+        self.replay_keep_times = replay_keep_times
+        self.replay_loop = replay_loop
+        self.prices = {symbol: 2.0 for symbol in self.symbols}
+        self.sent = Counter()
+        self._clients = []
+        self._clients_lock = threading.Lock()
+        self._server = None
+        self._running = False
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}/"
+
+    def start(self):
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((self.host, self.port))
+        self._server.listen()
+        self.port = self._server.getsockname()[1]
+        self._running = True
+        threading.Thread(target=self._accept_loop, daemon=True, name="MockAccept").start()
+        threading.Thread(target=self._stream_loop, daemon=True, name="MockStream").start()
+        logger.info(f"Mock CoinAPI server listening on {self.url}")
+        return self
+
+    def stop(self):
+        self._running = False
+        self.drop_connections()
+        if self._server:
+            self._server.close()
+
+    def drop_connections(self, count=None):
+        """Abruptly close every client connection, or only the first count of them."""
+        with self._clients_lock:
+            count = len(self._clients) if count is None else count
+            clients, self._clients = self._clients[:count], self._clients[count:]
+        for client in clients:
+            try:
+                client.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            client.sock.close()
+        if clients:
+            logger.info(f"Dropped {len(clients)} connection(s)")
+
+    def client_count(self):
+        with self._clients_lock:
+            return sum(1 for client in self._clients if client.subscribed)
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                sock, address = self._server.accept()
+            except OSError:
+                break
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._serve_client, args=(sock, address), daemon=True).start()
+
+    def _handshake(self, sock):
+        request = b""
+        while b"\r\n\r\n" not in request:
+            chunk = sock.recv(4096)
+            if not chunk:
+                return False
+            request += chunk
+        headers = {}
+        for line in request.decode(errors="replace").split("\r\n")[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        key = headers.get("sec-websocket-key")
+        if not key:
+            return False
+        accept = base64.b64encode(hashlib.sha1((key + _WS_GUID).encode()).digest()).decode()
+        sock.sendall((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode())
+        return True
+
+    @staticmethod
+    def _recv_exact(sock, size):
+        data = b""
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("client went away")
+            data += chunk
+        return data
+
+    def _read_frame(self, sock):
+        first, second = self._recv_exact(sock, 2)
+        opcode = first & 0x0F
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack('!H', self._recv_exact(sock, 2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', self._recv_exact(sock, 8))[0]
+        mask = self._recv_exact(sock, 4) if second & 0x80 else None
+        payload = self._recv_exact(sock, length)
+        if mask:
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        return opcode, payload
+
+    def _serve_client(self, sock, address):
+        client = _Client(sock, address)
+        try:
+            if not self._handshake(sock):
+                sock.close()
+                return
+            with self._clients_lock:
+                self._clients.append(client)
+            while self._running:
+                opcode, payload = self._read_frame(sock)
+                if opcode == _OP_CLOSE:
+                    client.send(payload[:2], _OP_CLOSE)
+                    break
+                if opcode == _OP_PING:
+                    client.send(payload, _OP_PONG)
+                elif opcode == _OP_TEXT:
+                    self._on_client_message(client, payload)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            with self._clients_lock:
+                if client in self._clients:
+                    self._clients.remove(client)
+            sock.close()
+
+    def _on_client_message(self, client, payload):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            client.send(json.dumps({"type": "error", "message": "Invalid JSON"}))
+            return
+        if message.get("type") == "hello":
+            client.subscribed = True
+            logger.info(f"Client {client.address} subscribed")
+        else:
+            client.send(json.dumps({"type": "error", "message": f"Unsupported message type {message.get('type')}"}))
+
+    def broadcast(self, message):
+        """Send a message to all subscribed clients, stamping per-connection sequence numbers."""
+        with self._clients_lock:
+            clients = [client for client in self._clients if client.subscribed]
+        for client in clients:
+            if message.get("type") in ("trade", "book50"):
+                message = dict(message, sequence=client.next_sequence(message["type"], message["symbol_id"]))
+            try:
+                client.send(json.dumps(message))
+            except OSError:
+                pass
+        if clients:
+            self.sent[message.get("type")] += 1
+
+    def make_trade(self, symbol=None):
+        symbol = symbol or random.choice(self.symbols)
+        self.prices[symbol] = max(0.0001, self.prices[symbol] * (1 + random.gauss(0, 0.0005)))
+        now = time.time_ns()
+        return {
+            "type": "trade",
+            "symbol_id": symbol,
+            "time_exchange": format_time(now),
+            "time_coinapi": format_time(now),
+            "uuid": str(uuid.uuid4()),
+            "price": round(self.prices[symbol], 6),
+            "size": round(random.uniform(1, 500), 2),
+            "taker_side": random.choice(["BUY", "SELL"])
+        }
+
+    def make_book(self, symbol=None):
+        symbol = symbol or random.choice(self.symbols)
+        price = self.prices[symbol]
+        tick = max(price * 0.0001, 0.000001)
+        now = time.time_ns()
+        return {
+            "type": "book50",
+            "symbol_id": symbol,
+            "time_exchange": format_time(now),
+            "time_coinapi": format_time(now),
+            "bids": [{"price": round(price - tick * (i + 1), 6), "size": round(random.uniform(1, 5000), 2)} for i in range(50)],
+            "asks": [{"price": round(price + tick * (i + 1), 6), "size": round(random.uniform(1, 5000), 2)} for i in range(50)]
+        }
+
+    def rate_at(self, elapsed):
+        """Trades per second at a point in the run, including bursts."""
+        if self.burst_every and elapsed % self.burst_every < self.burst_duration:
+            return self.rate * self.burst_multiplier
+        return self.rate
+
+    def _stream_loop(self):
+        if self.replay_path:
+            self._replay_loop()
+            return
+        started = last = next_heartbeat = time.monotonic()
+        trades_due = books_due = 0.0
+        while self._running:
+            now = time.monotonic()
+            # Accumulate what is due since the last tick so high rates are sent in small batches
+            trades_due += self.rate_at(now - started) * (now - last)
+            books_due += self.book_rate * len(self.symbols) * (now - last)
+            last = now
+            while trades_due >= 1:
+                self.broadcast(self.make_trade())
+                trades_due -= 1
+            while books_due >= 1:
+                self.broadcast(self.make_book())
+                books_due -= 1
+            if self.heartbeat_interval and now >= next_heartbeat:
+                self.broadcast({"type": "heartbeat"})
+                next_heartbeat = now + self.heartbeat_interval
+            time.sleep(0.001)
+
+    def _replay_loop(self):
+        """Send recorded messages (JSON lines) with their original spacing divided by replay_speed.
+
+        replay_speed may be changed while replaying; it applies from the next message on.
+        """
+        while self._running:
+            with open(self.replay_path, "r") as f:
+                previous = due = None
+                for line in f:
+                    if not self._running:
+                        return
+                    message = json.loads(line)
+                    recorded = parse_time_exchange(message.get("time_exchange"))
+                    if recorded is not None:
+                        if previous is None:
+                            due = time.monotonic()
+                        else:
+                            due += max(recorded - previous, 0) / 1e9 / self.replay_speed
+                        previous = recorded
+                        delay = due - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+                    if message.get("type") == "trade":
+                        # A fresh uuid per pass, or the client drops every loop after the first as duplicates
+                        message["uuid"] = str(uuid.uuid4())
+                    if message.get("type") in ("trade", "book50"):
+                        now = format_time(time.time_ns())
+                        message["time_coinapi"] = now
+                        if not self.replay_keep_times:
+                            message["time_exchange"] = now
+                    self.broadcast(message)
+            if not self.replay_loop:
+                return
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the CoinAPI websocket.")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--symbols", nargs="+", default=DEFAULT_SYMBOLS)
+    parser.add_argument("--num-symbols", type=int, default=0, help="Generate N synthetic symbols instead of --symbols")
+    parser.add_argument("--rate", type=float, default=10.0, help="Trades per second across all symbols")
+    parser.add_argument("--book-rate", type=float, default=0.0, help="book50 updates per second per symbol")
+    parser.add_argument("--burst-every", type=float, default=0, help="Start a burst every N seconds")
+    parser.add_argument("--burst-duration", type=float, default=1.0, help="Burst length in seconds")
+    parser.add_argument("--burst-multiplier", type=float, default=10.0, help="Trade rate multiplier during a burst")
+    parser.add_argument("--replay", help="Replay recorded CoinAPI messages from a JSON lines file")
+    parser.add_argument("--replay-speed", type=float, default=1.0, help="Replay speed-up factor")
+    parser.add_argument("--replay-keep-times", action="store_true", help="Keep recorded time_exchange values")
+    parser.add_argument("--drop-every", type=float, default=0, help="Drop all connections every N seconds")
+    args = parser.parse_args()
+    symbols = synthetic_symbols(args.num_symbols) if args.num_symbols else args.symbols
+    server = MockCoinAPIServer(
+        port=args.port, symbols=symbols, rate=args.rate, book_rate=args.book_rate,
+        burst_every=args.burst_every, burst_duration=args.burst_duration, burst_multiplier=args.burst_multiplier,
+        replay_path=args.replay, replay_speed=args.replay_speed, replay_keep_times=args.replay_keep_times
+    ).start()
+    logger.info(f"Point the bot at it with COINAPI_WS_URL={server.url}")
+    try:
+        while True:
+            time.sleep(args.drop_every or 1)
+            if args.drop_every:
+                server.drop_connections()
+    except KeyboardInterrupt:
+        server.stop()
@@ -1,15 +1,10 @@
-import json
-from queue import Queue, Empty  # Import Empty from queue module
 import mysql.connector
 import time
 import logging
-from datetime import datetime
 from threading import Thread
 
-import pytz
-
-# Create a queue in this module since it's not defined in web_dashboard
-from web_dashboard import mysql_queue
+from time_utils import ns_to_datetime
+from web_dashboard import open_row_spool
 
 # Configure standard logger for mysql_storage.py
 logger = logging.getLogger("mysql_storage")
@@ -51,18 +46,63 @@ db_config = {
     'database': 'trading_db',
     'raise_on_warnings': True
 }
+# Schema setup runs without raise_on_warnings: notes such as "table already exists" are not errors
+schema_config = dict(db_config, raise_on_warnings=False)
 
-# Initialize MySQL connection
-conn = None
-try:
-    conn = mysql.connector.connect(**db_config)
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS pi_trades (
+# Rows per INSERT when draining the spool to MySQL
+DRAIN_BATCH_ROWS = 1000
+DRAIN_IDLE_SECONDS = 0.5
+# Backoff between reconnect attempts while MySQL is down (doubles up to the maximum)
+RECONNECT_MIN_SECONDS = 1
+RECONNECT_MAX_SECONDS = 60
+# Wait before retrying a schema setup that MySQL refused (privileges, bad DDL): not an outage
+SCHEMA_RETRY_SECONDS = 300
+# Client errors meaning the server is unreachable or the link dropped
+CONNECTION_ERRNOS = {2002, 2003, 2005, 2006, 2013, 2055}
+
+INSERT_COLUMNS = [
+    'symbol', 'current_price', 'timestamp', 'timestamp_ns', 'trend', 'buy_score', 'sell_score', 'hold_score',
+    'ma5', 'ma10', 'ma15', 'ma30', 'macd', 'macd_signal', 'macd_diff', 'volume', 'rsi',
+    'bb_upper', 'bb_middle', 'bb_lower', 'stoch_k', 'stoch_d', 'vwap', 'spread', 'imbalance',
+    'processing_time'
+]
+INSERT_SQL = (
+    f"INSERT INTO pi_trades ({', '.join(INSERT_COLUMNS)}) "
+    f"VALUES ({', '.join(['%s'] * len(INSERT_COLUMNS))})"
+)
+
+class SchemaError(Exception):
+    """MySQL is reachable but refused to create or migrate the tables."""
+
+def ensure_table(cursor, table, columns):
+    """Create a table unless it exists."""
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (table,)
+    )
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(f"CREATE TABLE {table} ({columns})")
+        logger.info(f"Created table {table}")
+
+def ensure_column(cursor, table, column, definition):
+    """Add a column to a table created by an older version of this script."""
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+        (table, column)
+    )
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        logger.info(f"Added column {column} to {table}")
+
+def ensure_tables(cursor):
+    """Create pi_trades and the spool checkpoint table if they do not exist yet."""
+    ensure_table(cursor, 'pi_trades', """
             id INT AUTO_INCREMENT PRIMARY KEY,
             symbol VARCHAR(255),
             current_price DECIMAL(20, 8),
             timestamp DATETIME(6),
+            timestamp_ns BIGINT,
             trend VARCHAR(10),
             buy_score INT,
             sell_score INT,
@@ -85,121 +125,202 @@ try:
             spread DECIMAL(20, 8),
             imbalance DECIMAL(20, 8),
             processing_time DECIMAL(10, 4)
-        )
     """)
-    conn.commit()
-    logger.info("Connected to MySQL and created table pi_trades")
-except mysql.connector.Error as err:
-    logger.error(f"Failed to connect to MySQL: {err}")
-
-def store_data(data):
-    if not conn:
-        logger.error("No MySQL connection available")
-        return False
+    # Runs on every start, whether or not the table was just created
+    ensure_column(cursor, 'pi_trades', 'timestamp_ns', 'BIGINT AFTER timestamp')
+    # Last spool sequence number stored in pi_trades, updated in the same transaction as the rows
+    ensure_table(cursor, 'pi_spool_checkpoint', """
+            spool_id VARCHAR(64) PRIMARY KEY,
+            last_seq BIGINT NOT NULL
+    """)
+
+def row_values(data):
+    """Map a latest_data row to INSERT_COLUMNS values."""
+    # Epoch nanoseconds; DATETIME(6) keeps microseconds, timestamp_ns the full value
+    return (
+        data['symbol'],
+        data['current_price'],
+        ns_to_datetime(int(data['timestamp'])),
+        int(data['timestamp']),
+        data['trend'],
+        data['buy'],
+        data['sell'],
+        data['hold'],
+        data['ma5'],
+        data['ma10'],
+        data['ma15'],
+        data['ma30'],
+        data['macd'],
+        data['macd_signal'],
+        data['macd_diff'],
+        data['volume'],
+        data['rsi'],
+        data['bb_upper'],
+        data['bb_middle'],
+        data['bb_lower'],
+        data['stoch_k'],
+        data['stoch_d'],
+        data['vwap'],
+        data['spread'],
+        data['imbalance'],
+        data['processing_time']
+    )
+
+def is_connection_error(err):
+    """True if a MySQL error means the server is down or the link dropped."""
+    return isinstance(err, mysql.connector.InterfaceError) or err.errno in CONNECTION_ERRNOS
+
+def ensure_schema():
+    """Create and migrate the tables on a connection of their own, without raise_on_warnings.
+
+    Raises SchemaError if MySQL is up but refuses the DDL; connection errors pass through.
+    """
+    conn = mysql.connector.connect(**schema_config)
     try:
-        utc_time = datetime.strptime(data['timestamp'], '%Y-%m-%d %H:%M:%S')
-        timestamp_dt = utc_time.replace(tzinfo=pytz.UTC)
         cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO pi_trades (
-                symbol, current_price, timestamp, trend, buy_score, sell_score, hold_score,
-                ma5, ma10, ma15, ma30, macd, macd_signal, macd_diff, volume, rsi,
-                bb_upper, bb_middle, bb_lower, stoch_k, stoch_d, vwap, spread, imbalance,
-                processing_time
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
-            data['symbol'],
-            data['current_price'],
-            timestamp_dt,
-            data['trend'],
-            data['buy'],
-            data['sell'],
-            data['hold'],
-            data['ma5'],
-            data['ma10'],
-            data['ma15'],
-            data['ma30'],
-            data['macd'],
-            data['macd_signal'],
-            data['macd_diff'],
-            data['volume'],
-            data['rsi'],
-            data['bb_upper'],
-            data['bb_middle'],
-            data['bb_lower'],
-            data['stoch_k'],
-            data['stoch_d'],
-            data['vwap'],
-            data['spread'],
-            data['imbalance'],
-            data['processing_time']
-        ))
+        ensure_tables(cursor)
         conn.commit()
-        timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())
-        logger.info(f"Stored data for {data['symbol']} at {data['timestamp']}")
-        detailed_logger.info(
-            "Stored data in MySQL",
-            extra={
-                'data_received': json.dumps(data),
-                'time': timestamp,
-                'next_step': 'Data available for n8n/AI processing'
-            }
-        )
-        return True
+        cursor.close()
     except mysql.connector.Error as err:
-        logger.error(f"Failed to store data in MySQL: {err}")
-        if not conn.is_connected():
-            logger.warning("MySQL connection lost. Attempting to reconnect...")
-            try:
-                conn.reconnect(attempts=3, delay=5)
-                logger.info("Reconnected to MySQL successfully")
-            except mysql.connector.Error as reconnect_err:
-                logger.error(f"Failed to reconnect to MySQL: {reconnect_err}")
-        return False
-    except ValueError as ve:
-        logger.error(f"Timestamp parsing error: {ve}")
-        return False
-
-def process_mysql():
-    logger.info("Starting MySQL storage...")
+        if is_connection_error(err):
+            raise
+        raise SchemaError(str(err)) from err
+    finally:
+        conn.close()
+
+def connect():
+    return mysql.connector.connect(**db_config)
+
+def load_checkpoint(conn, spool):
+    """Last seq already stored; MySQL wins over the local file since both change in one transaction."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT last_seq FROM pi_spool_checkpoint WHERE spool_id = %s", (spool.spool_id,))
+    row = cursor.fetchone()
+    cursor.close()
+    return row[0] if row else spool.committed_seq
+
+def store_rows(conn, spool, records):
+    """Insert spooled (seq, row) records and advance the MySQL checkpoint in one transaction.
+
+    Returns the number of rows inserted. Rows MySQL refuses are set aside in the spool's
+    rejected file so one bad value cannot stall the drain.
+    """
+    valid = []
+    for seq, data in records:
+        try:
+            valid.append((seq, data, row_values(data)))
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"Skipping malformed spooled row {seq}: {e}")
+            spool.reject(seq, data, str(e))
+    last_seq = records[-1][0]
+    cursor = conn.cursor()
+    try:
+        try:
+            cursor.executemany(INSERT_SQL, [row for _, _, row in valid])
+            stored = len(valid)
+        except mysql.connector.Error as err:
+            if not conn.is_connected():
+                raise
+            # A data error, not an outage: store the batch row by row to isolate the bad rows
+            logger.warning(f"Batch insert failed ({err}); retrying row by row")
+            conn.rollback()
+            stored = 0
+            for seq, data, row in valid:
+                try:
+                    cursor.execute(INSERT_SQL, row)
+                    stored += 1
+                except mysql.connector.Error as row_err:
+                    if not conn.is_connected():
+                        raise
+                    logger.error(f"MySQL rejected spooled row {seq}: {row_err}")
+                    spool.reject(seq, data, str(row_err))
+        cursor.execute(
+            "INSERT INTO pi_spool_checkpoint (spool_id, last_seq) VALUES (%s, %s) "
+            "ON DUPLICATE KEY UPDATE last_seq = VALUES(last_seq)",
+            (spool.spool_id, last_seq)
+        )
+        conn.commit()
+    finally:
+        cursor.close()
+    return stored
+
+def drain_spool(spool=None):
+    """Write spooled rows to MySQL in order, exactly once, reconnecting with backoff."""
+    spool = spool or open_row_spool()
+    logger.info("Starting MySQL spool drain...")
+    conn = None
+    schema_ready = False
+    checkpoint = None
+    delay = RECONNECT_MIN_SECONDS
     while True:
         try:
-            # Use a timeout to avoid blocking indefinitely
-            data = mysql_queue.get(timeout=5)
+            if not schema_ready:
+                ensure_schema()
+                schema_ready = True
+            if conn is None or not conn.is_connected():
+                conn = connect()
+                checkpoint = None
+                logger.info("Connected to MySQL")
+                delay = RECONNECT_MIN_SECONDS
+            if checkpoint is None:
+                # Re-read after every reconnect or error: the last commit may have landed anyway
+                checkpoint = load_checkpoint(conn, spool)
+                if checkpoint > spool.committed_seq:
+                    spool.commit(checkpoint)
+                logger.info(f"Draining spool from seq {checkpoint} ({spool.pending()} pending)")
+            records = spool.read(checkpoint, DRAIN_BATCH_ROWS)
+            if not records:
+                time.sleep(DRAIN_IDLE_SECONDS)
+                continue
+            stored = store_rows(conn, spool, records)
+            # Stored in MySQL from here on, even if the local checkpoint below fails
+            checkpoint = records[-1][0]
+            spool.commit(checkpoint)
             timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())
-            logger.info(f"Received data for storage: {data['symbol']} at {data['timestamp']}")
+            logger.info(f"Stored {stored} rows in MySQL (up to seq {checkpoint}, {spool.pending()} pending)")
             detailed_logger.info(
-                "Received data for storage",
+                "Stored data in MySQL",
                 extra={
-                    'data_received': json.dumps(data),
+                    'data_received': f"{stored} rows, seq {records[0][0]}-{checkpoint}",
                     'time': timestamp,
-                    'next_step': 'Storing data in MySQL'
+                    'next_step': 'Data available for n8n/AI processing'
                 }
             )
-            if store_data(data):
-                logger.info("Data processed and stored in MySQL")
-            else:
-                logger.warning("Failed to store data in MySQL")
-        except Empty:  # Use the proper exception name
-            # This is expected behavior when the queue is empty
-            time.sleep(1)
+        except SchemaError as err:
+            logger.error(
+                f"MySQL schema setup failed, retrying in {SCHEMA_RETRY_SECONDS}s; "
+                f"rows stay in the spool ({spool.pending()} pending): {err}"
+            )
+            time.sleep(SCHEMA_RETRY_SECONDS)
+        except mysql.connector.Error as err:
+            logger.error(f"MySQL unavailable, rows stay in the spool ({spool.pending()} pending): {err}")
+            if conn is not None:
+                try:
+                    conn.close()
+                except mysql.connector.Error:
+                    pass
+            conn = None
+            time.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_SECONDS)
         except Exception as e:
-            logger.error(f"Error processing MySQL storage: {e}")
+            logger.error(f"Error draining spool to MySQL: {e}")
+            checkpoint = None
             time.sleep(1)
 
-# Function to add data to the queue (to be called from web_dashboard.py)
+# Function to add data to the spool (to be called from web_dashboard.py)
 def add_to_mysql_queue(data):
-    mysql_queue.put(data)
-    logger.info(f"Added data to MySQL queue for {data['symbol']}")
+    open_row_spool().append([data])
+    logger.info(f"Spooled data for MySQL for {data['symbol']}")
 
 if __name__ == "__main__":
     logger.info("Starting MySQL process...")
-    mysql_thread = Thread(target=process_mysql, daemon=True)
-    mysql_thread.start()
+    # Fails here, not in the thread, if the bot already has the spool open
+    spool = open_row_spool()
+    drain_thread = Thread(target=drain_spool, args=(spool,), daemon=True)
+    drain_thread.start()
     try:
         while True:
             time.sleep(1)
     except KeyboardInterrupt:
         logger.info("Shutting down MySQL storage...")
-        if conn:
-            conn.close()
\ No newline at end of file
+        spool.close()
\ No newline at end of file
@@ -0,0 +1,231 @@
+import bisect
+import logging
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+# Configure logging for orderbook_store.py
+logger = logging.getLogger("orderbook_store")
+logger.setLevel(logging.INFO)
+
+# File handler for orderbook_store.log
+fh = logging.FileHandler('orderbook_store.log')
+fh.setLevel(logging.INFO)
+formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+fh.setFormatter(formatter)
+logger.addHandler(fh)
+
+# Stream handler for console output
+sh = logging.StreamHandler()
+sh.setLevel(logging.INFO)
+sh.setFormatter(formatter)
+logger.addHandler(sh)
+
+# Segment files live under ORDERBOOK_DIR/<symbol>/<YYYYMMDDHH>.obk, one per UTC hour
+ORDERBOOK_DIR = 'orderbook_data'
+# A full snapshot is written at least this often; updates in between are stored as diffs
+SNAPSHOT_INTERVAL_SECONDS = 60
+SNAPSHOT_EVERY_UPDATES = 500
+FLUSH_INTERVAL_SECONDS = 1
+
+# Prices and sizes are stored as fixed-point int64 with 8 decimals (same scale as DECIMAL(20, 8))
+SCALE = 10 ** 8
+
+# Record: kind, timestamp ns, bid level count, ask level count, then (price, size) int64 pairs.
+# Diff records list changed levels only; size 0 removes a level.
+RECORD_HEADER = struct.Struct('<BqHH')
+SNAPSHOT, DIFF = 0, 1
+# Index entry per snapshot record: timestamp ns, byte offset in the segment
+INDEX_ENTRY = struct.Struct('<qq')
+_LEVEL = np.dtype('<i8')
+
+
+def _to_levels(entries):
+    """Convert book50 [{'price', 'size'}] entries to a {price_fp: size_fp} dict."""
+    if not entries:
+        return {}
+    prices = np.rint(np.array([entry['price'] for entry in entries], dtype=np.float64) * SCALE).astype(np.int64)
+    sizes = np.rint(np.array([entry['size'] for entry in entries], dtype=np.float64) * SCALE).astype(np.int64)
+    return dict(zip(prices.tolist(), sizes.tolist()))
+
+
+def _diff(old, new):
+    changes = {price: size for price, size in new.items() if old.get(price) != size}
+    changes.update({price: 0 for price in old if price not in new})
+    return changes
+
+
+def _pack(kind, ts, bids, asks):
+    levels = np.array(list(bids.items()) + list(asks.items()), dtype=_LEVEL).reshape(-1)
+    return RECORD_HEADER.pack(kind, ts, len(bids), len(asks)) + levels.tobytes()
+
+
+def _segment_name(ts):
+    return time.strftime('%Y%m%d%H', time.gmtime(ts // 1_000_000_000))
+
+
+class _SymbolWriter:
+    def __init__(self):
+        self.segment = None
+        self.data_file = None
+        self.index_file = None
+        self.bids = {}
+        self.asks = {}
+        self.last_snapshot = 0
+        self.last_ts = 0
+        self.updates = 0
+
+    def close(self):
+        for f in (self.data_file, self.index_file):
+            if f:
+                f.close()
+        self.data_file = self.index_file = None
+
+
+class OrderBookStore:
+    """Per-symbol order-book history: periodic snapshots plus diffs in hourly segment files."""
+
+    def __init__(self, base_dir=ORDERBOOK_DIR):
+        self.base_dir = base_dir
+        self._writers = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        # Updates dropped because they were older than the last one stored for the symbol
+        self.out_of_order = 0
+
+    def _symbol_dir(self, symbol):
+        return os.path.join(self.base_dir, symbol.replace('/', '_'))
+
+    def _open_segment(self, symbol, writer, segment):
+        writer.close()
+        directory = self._symbol_dir(symbol)
+        os.makedirs(directory, exist_ok=True)
+        writer.data_file = open(os.path.join(directory, f"{segment}.obk"), 'ab')
+        writer.index_file = open(os.path.join(directory, f"{segment}.idx"), 'ab')
+        writer.segment = segment
+
+    def record(self, book):
+        """Store a book50 update (symbol, bids, asks, timestamp in epoch ns).
+
+        Returns False if the update is older than the last one stored for the symbol and was dropped.
+        """
+        ts = int(book['timestamp'])
+        bids, asks = _to_levels(book['bids']), _to_levels(book['asks'])
+        with self._lock:
+            writer = self._writers.setdefault(book['symbol'], _SymbolWriter())
+            # Records and index entries must stay in time order for book_at(); a late update
+            # is superseded by the newer book already stored
+            if ts < writer.last_ts:
+                self.out_of_order += 1
+                return False
+            writer.last_ts = ts
+            segment = _segment_name(ts)
+            # Every segment starts with a snapshot so it can be read on its own
+            snapshot = (
+                segment != writer.segment
+                or ts - writer.last_snapshot >= SNAPSHOT_INTERVAL_SECONDS * 1_000_000_000
+                or writer.updates >= SNAPSHOT_EVERY_UPDATES
+            )
+            if segment != writer.segment:
+                self._open_segment(book['symbol'], writer, segment)
+            if snapshot:
+                writer.index_file.write(INDEX_ENTRY.pack(ts, writer.data_file.tell()))
+                writer.data_file.write(_pack(SNAPSHOT, ts, bids, asks))
+                writer.last_snapshot = ts
+                writer.updates = 0
+            else:
+                bid_changes, ask_changes = _diff(writer.bids, bids), _diff(writer.asks, asks)
+                if not bid_changes and not ask_changes:
+                    return True
+                writer.data_file.write(_pack(DIFF, ts, bid_changes, ask_changes))
+                writer.updates += 1
+            writer.bids, writer.asks = bids, asks
+            if time.monotonic() - self._last_flush >= FLUSH_INTERVAL_SECONDS:
+                self._flush_locked()
+        return True
+
+    def _flush_locked(self):
+        for writer in self._writers.values():
+            for f in (writer.data_file, writer.index_file):
+                if f:
+                    f.flush()
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        with self._lock:
+            self._flush_locked()
+            for writer in self._writers.values():
+                writer.close()
+
+    def _segments(self, symbol):
+        directory = self._symbol_dir(symbol)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-4] for name in os.listdir(directory) if name.endswith('.obk'))
+
+    def book_at(self, symbol, ts):
+        """Reconstruct the book at a timestamp (epoch ns).
+
+        Returns (bids, asks) as lists of (price, size) floats, bids best first, asks best first,
+        or None if nothing was recorded at or before ts.
+        """
+        self.flush()
+        segments = self._segments(symbol)
+        position = bisect.bisect_right(segments, _segment_name(ts))
+        # Walk back past segments that start after ts (e.g. the first update came late in the hour)
+        for segment in reversed(segments[:position]):
+            book = self._replay(symbol, segment, ts)
+            if book is not None:
+                bids, asks = book
+                return (
+                    [(price / SCALE, size / SCALE) for price, size in sorted(bids.items(), reverse=True)],
+                    [(price / SCALE, size / SCALE) for price, size in sorted(asks.items())]
+                )
+        return None
+
+    def _replay(self, symbol, segment, ts):
+        base = os.path.join(self._symbol_dir(symbol), segment)
+        with open(f"{base}.idx", 'rb') as f:
+            index = np.frombuffer(f.read(), dtype=np.dtype([('ts', '<i8'), ('offset', '<i8')]))
+        start = int(np.searchsorted(index['ts'], ts, side='right')) - 1
+        if start < 0:
+            return None
+        begin = int(index['offset'][start])
+        with open(f"{base}.obk", 'rb') as f:
+            f.seek(begin)
+            # Records from the next snapshot on are all after ts; the last snapshot reads to the end
+            data = f.read(int(index['offset'][start + 1]) - begin) if start + 1 < len(index) else f.read()
+        bids, asks = {}, {}
+        offset = 0
+        while offset + RECORD_HEADER.size <= len(data):
+            kind, record_ts, n_bids, n_asks = RECORD_HEADER.unpack_from(data, offset)
+            if record_ts > ts:
+                break
+            end = offset + RECORD_HEADER.size + (n_bids + n_asks) * 16
+            if end > len(data):
+                break  # Partially written tail
+            levels = np.frombuffer(data, dtype=_LEVEL, count=(n_bids + n_asks) * 2,
+                                   offset=offset + RECORD_HEADER.size).reshape(-1, 2).tolist()
+            if kind == SNAPSHOT:
+                bids = dict(levels[:n_bids])
+                asks = dict(levels[n_bids:])
+            else:
+                for side, changes in ((bids, levels[:n_bids]), (asks, levels[n_bids:])):
+                    for price, size in changes:
+                        if size:
+                            side[price] = size
+                        else:
+                            side.pop(price, None)
+            offset = end
+        return bids, asks
+
+
+# Shared store used by process_trades
+book_store = OrderBookStore()
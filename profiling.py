@@ -0,0 +1,259 @@
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Configure logging for profiling.py
+logger = logging.getLogger("profiling")
+logger.setLevel(logging.INFO)
+
+# File handler for profiling.log
+fh = logging.FileHandler('profiling.log')
+fh.setLevel(logging.INFO)
+formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+fh.setFormatter(formatter)
+logger.addHandler(fh)
+
+# Stream handler for console output
+sh = logging.StreamHandler()
+sh.setLevel(logging.INFO)
+sh.setFormatter(formatter)
+logger.addHandler(sh)
+
+# Where profiles, snapshots and stack dumps are written
+PROFILE_DIR = 'profiles'
+# Default and longest CPU profile, and the sampling interval
+CPU_PROFILE_SECONDS = 30
+MAX_CPU_PROFILE_SECONDS = 300
+SAMPLE_INTERVAL_SECONDS = 0.005
+# Frames kept per tracemalloc allocation and lines reported per memory diff
+TRACEMALLOC_FRAMES = 25
+TOP_STATS = 25
+# tracemalloc slows every allocation; it is stopped when no snapshot was taken for this long
+MEMORY_TRACE_IDLE_SECONDS = 600
+# Local control endpoint (localhost only); set PROFILING_PORT=0 to disable
+PROFILING_PORT = int(os.environ.get("PROFILING_PORT", "8799"))
+
+# name -> callable returning a number, reported with every stack dump (queue sizes etc.)
+_gauges = {}
+_previous_snapshot = None
+_memory_timer = None
+_cpu_lock = threading.Lock()
+_memory_lock = threading.Lock()
+
+
+def register_gauge(name, fn):
+    """Report fn() under name in stack dumps, e.g. register_gauge('trade_queue', trade_queue.qsize)."""
+    _gauges[name] = fn
+
+
+def read_gauges():
+    values = {}
+    for name, fn in _gauges.items():
+        try:
+            values[name] = fn()
+        except Exception as e:
+            values[name] = f"error: {e}"
+    return values
+
+
+def _output_path(kind, extension):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    return os.path.join(PROFILE_DIR, f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}.{extension}")
+
+
+def _thread_names():
+    return {thread.ident: thread.name for thread in threading.enumerate()}
+
+
+def profile_cpu(seconds=CPU_PROFILE_SECONDS, interval=SAMPLE_INTERVAL_SECONDS):
+    """Sample the stacks of every thread for a while and write them in collapsed (flame graph) format.
+
+    Returns the path of the .folded file; a .txt summary of the hottest frames sits next to it.
+    """
+    if not 0 < seconds <= MAX_CPU_PROFILE_SECONDS:
+        raise ValueError(f"CPU profile length must be between 0 and {MAX_CPU_PROFILE_SECONDS} seconds")
+    if not _cpu_lock.acquire(blocking=False):
+        raise RuntimeError("A CPU profile is already running")
+    try:
+        me = threading.get_ident()
+        stacks = Counter()
+        own_time = Counter()
+        samples = 0
+        names = _thread_names()
+        deadline = time.monotonic() + seconds
+        logger.info(f"CPU profile started for {seconds}s")
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if ident not in names:
+                    names = _thread_names()
+                entries = []
+                for summary in traceback.extract_stack(frame):
+                    entries.append(f"{summary.name} ({os.path.basename(summary.filename)}:{summary.lineno})")
+                stacks[";".join([names.get(ident, str(ident))] + entries)] += 1
+                if entries:
+                    own_time[entries[-1]] += 1
+            samples += 1
+            time.sleep(interval)
+
+        path = _output_path("cpu", "folded")
+        with open(path, "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        total = sum(own_time.values()) or 1
+        with open(path[:-len("folded")] + "txt", "w") as f:
+            f.write(f"{samples} samples over {seconds}s, every {interval * 1000:.1f}ms\n\n")
+            f.write("Hottest frames (share of thread samples spent in the frame itself):\n")
+            for frame, count in own_time.most_common(TOP_STATS):
+                f.write(f"{count / total:7.2%}  {frame}\n")
+        logger.info(f"CPU profile written to {path}")
+        return path
+    finally:
+        _cpu_lock.release()
+
+
+def _restart_memory_timer():
+    global _memory_timer
+    if _memory_timer is not None:
+        _memory_timer.cancel()
+    _memory_timer = threading.Timer(MEMORY_TRACE_IDLE_SECONDS, stop_memory_tracing)
+    _memory_timer.daemon = True
+    _memory_timer.start()
+
+
+def stop_memory_tracing():
+    """Stop tracemalloc and forget the baseline; the next snapshot starts a new one."""
+    global _previous_snapshot, _memory_timer
+    with _memory_lock:
+        if _memory_timer is not None:
+            _memory_timer.cancel()
+            _memory_timer = None
+        _previous_snapshot = None
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("tracemalloc stopped")
+
+
+def snapshot_memory():
+    """Take a tracemalloc snapshot and write the top growth since the previous one.
+
+    The first call starts tracing and records the baseline. Tracing stops after
+    MEMORY_TRACE_IDLE_SECONDS without a snapshot, or on stop_memory_tracing(). Returns the
+    report path, or None for the baseline call.
+    """
+    global _previous_snapshot
+    with _memory_lock:
+        _restart_memory_timer()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            _previous_snapshot = tracemalloc.take_snapshot()
+            logger.info(
+                f"tracemalloc started; the next memory snapshot reports growth from now "
+                f"(stops after {MEMORY_TRACE_IDLE_SECONDS}s without one)"
+            )
+            return None
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+        path = _output_path("memory", "txt")
+        snapshot.dump(path[:-len("txt")] + "snapshot")
+        current, peak = tracemalloc.get_traced_memory()
+        with open(path, "w") as f:
+            f.write(f"Traced memory: current {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB\n")
+            f.write(f"Gauges: {json.dumps(read_gauges())}\n\n")
+            f.write("Top growth since the previous snapshot:\n")
+            for stat in snapshot.compare_to(_previous_snapshot, "lineno")[:TOP_STATS]:
+                f.write(f"{stat}\n")
+            f.write("\nLargest allocation sites:\n")
+            for stat in snapshot.statistics("traceback")[:5]:
+                f.write(f"{stat.size / 1e6:.1f} MB in {stat.count} blocks\n")
+                f.write("".join(f"    {line}\n" for line in stat.traceback.format()))
+        _previous_snapshot = snapshot
+        logger.info(f"Memory report written to {path}")
+        return path
+
+
+def dump_stacks():
+    """Write the current stack of every thread plus the registered gauges (queue sizes)."""
+    names = _thread_names()
+    path = _output_path("stacks", "txt")
+    with open(path, "w") as f:
+        f.write(f"Gauges: {json.dumps(read_gauges())}\n")
+        for ident, frame in sys._current_frames().items():
+            f.write(f"\nThread {names.get(ident, ident)} ({ident}):\n")
+            f.write("".join(traceback.format_stack(frame)))
+    logger.info(f"Thread stacks written to {path}")
+    return path
+
+
+def _in_background(target, *args):
+    def run():
+        try:
+            target(*args)
+        except Exception as e:
+            logger.error(f"Profiling {target.__name__} failed: {e}")
+    threading.Thread(target=run, daemon=True, name="Profiler").start()
+
+
+def install_signal_handlers():
+    """SIGUSR1: stack dump + CPU profile, SIGUSR2: memory snapshot. Must run on the main thread."""
+    if not hasattr(signal, "SIGUSR1"):
+        logger.info("Profiling signals not available on this platform; use the local endpoint")
+        return
+    signal.signal(signal.SIGUSR1, lambda signum, frame: (_in_background(dump_stacks), _in_background(profile_cpu)))
+    signal.signal(signal.SIGUSR2, lambda signum, frame: _in_background(snapshot_memory))
+    logger.info(f"Profiling signals installed (kill -USR1/-USR2 {os.getpid()})")
+
+
+class _ProfilingHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        try:
+            if url.path == "/profile/cpu":
+                seconds = float(query.get("seconds", [CPU_PROFILE_SECONDS])[0])
+                result = {"file": profile_cpu(seconds)}
+            elif url.path == "/profile/memory" and query.get("stop", ["0"])[0] not in ("0", ""):
+                stop_memory_tracing()
+                result = {"tracing": False}
+            elif url.path == "/profile/memory":
+                result = {"file": snapshot_memory()}
+            elif url.path == "/profile/stacks":
+                result = {"file": dump_stacks()}
+            elif url.path == "/profile/gauges":
+                result = read_gauges()
+            else:
+                self.send_error(404, "Use /profile/cpu?seconds=N, /profile/memory[?stop=1], /profile/stacks or /profile/gauges")
+                return
+            status = 200
+        except (RuntimeError, ValueError) as e:
+            result, status = {"error": str(e)}, 409
+        body = json.dumps(result).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.info(f"Profiling request: {format % args}")
+
+
+def run_profiling_server(port=PROFILING_PORT):
+    """Serve the profiling endpoint on localhost until the process exits."""
+    if not port:
+        return
+    server = ThreadingHTTPServer(("127.0.0.1", port), _ProfilingHandler)
+    logger.info(f"Profiling endpoint on http://127.0.0.1:{port}/profile/")
+    server.serve_forever()
@@ -0,0 +1,243 @@
+import json
+import logging
+import os
+import threading
+import time
+
+# Configure logging for scheduler.py
+logger = logging.getLogger("scheduler")
+logger.setLevel(logging.INFO)
+
+# File handler for scheduler.log
+fh = logging.FileHandler('scheduler.log')
+fh.setLevel(logging.INFO)
+formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+fh.setFormatter(formatter)
+logger.addHandler(fh)
+
+# Stream handler for console output
+sh = logging.StreamHandler()
+sh.setLevel(logging.INFO)
+sh.setFormatter(formatter)
+logger.addHandler(sh)
+
+# "hot" symbols are recomputed in the first cycle after every tick; "cold" symbols collect
+# ticks and are recomputed once per interval. Symbols missing from the config get the default.
+DEFAULT_PRIORITY = 'hot'
+# Longest a tick may wait before its symbol is recomputed
+HOT_LATENCY_BUDGET_MS = 100
+COLD_LATENCY_BUDGET_MS = 5000
+# How long a cold symbol collects ticks before one recompute covers all of them
+COLD_INTERVAL_MS = 1000
+# Messages still queued after a cycle's intake before the scheduler counts as falling behind
+BACKLOG_LIMIT = 100
+# Consecutive cycles within budget before book-only recomputes resume
+RECOVERY_CYCLES = 20
+# Optional JSON file: {"default_priority": "cold",
+#                      "symbols": {"BITGET_SPOT_PI_USDT": {"priority": "hot", "latency_budget_ms": 50}}}
+SCHEDULER_CONFIG_FILE = os.environ.get('SCHEDULER_CONFIG', 'scheduler_config.json')
+
+_DEFAULT_BUDGETS = {'hot': HOT_LATENCY_BUDGET_MS, 'cold': COLD_LATENCY_BUDGET_MS}
+
+
+def _positive_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0
+
+
+def validate_config(config):
+    """Return a copy of the config without invalid entries, logging an error for each one.
+
+    Unknown priorities and non-positive budgets or intervals fall back to the defaults, so a
+    typo in the file degrades one setting instead of stopping trade processing.
+    """
+    if not isinstance(config, dict):
+        logger.error(f"Scheduler config must be a JSON object, got {type(config).__name__}; using defaults")
+        return {}
+    valid = {}
+    default_priority = config.get('default_priority', DEFAULT_PRIORITY)
+    if default_priority in _DEFAULT_BUDGETS:
+        valid['default_priority'] = default_priority
+    else:
+        logger.error(f"Unknown default_priority {default_priority!r}; using {DEFAULT_PRIORITY!r}")
+    if 'cold_interval_ms' in config:
+        if _positive_number(config['cold_interval_ms']):
+            valid['cold_interval_ms'] = config['cold_interval_ms']
+        else:
+            logger.error(f"Invalid cold_interval_ms {config['cold_interval_ms']!r}; using {COLD_INTERVAL_MS}")
+    symbols = config.get('symbols', {})
+    if not isinstance(symbols, dict):
+        logger.error("Scheduler config 'symbols' must be an object; ignoring per-symbol settings")
+        symbols = {}
+    valid['symbols'] = {}
+    for symbol, entry in symbols.items():
+        if not isinstance(entry, dict):
+            logger.error(f"Scheduler config for {symbol} must be an object; using defaults")
+            continue
+        entry = dict(entry)
+        if 'priority' in entry and entry['priority'] not in _DEFAULT_BUDGETS:
+            logger.error(f"Unknown priority {entry.pop('priority')!r} for {symbol}; using the default priority")
+        if 'latency_budget_ms' in entry and not _positive_number(entry['latency_budget_ms']):
+            logger.error(f"Invalid latency_budget_ms {entry.pop('latency_budget_ms')!r} for {symbol}; using the default budget")
+        valid['symbols'][symbol] = entry
+    return valid
+
+
+def load_config(path=SCHEDULER_CONFIG_FILE):
+    """Read per-symbol priorities and budgets, falling back to the defaults above."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.error(f"Cannot read scheduler configuration from {path}: {e}; using defaults")
+        return {}
+    logger.info(f"Loaded scheduler configuration from {path}")
+    return validate_config(config)
+
+
+class ComputeScheduler:
+    """Decides which symbols get their indicators recomputed in each processing cycle.
+
+    Incoming ticks only mark a symbol as pending. Each cycle computes the pending hot symbols
+    first, then cold symbols whose interval is up while the cycle still has time left. When a
+    hot symbol misses its budget or the trade queue keeps a backlog, the scheduler is degraded:
+    recomputes caused only by an order-book update are skipped until it catches up.
+    """
+
+    def __init__(self, config=None):
+        config = load_config() if config is None else validate_config(config)
+        self.default_priority = config.get('default_priority', DEFAULT_PRIORITY)
+        self.cold_interval = config.get('cold_interval_ms', COLD_INTERVAL_MS) / 1000
+        self.symbol_config = config.get('symbols', {})
+        self._policies = {}
+        self._pending = {}  # symbol -> {'trades': n, 'books': n, 'since': monotonic time of the oldest tick}
+        self._last_computed = {}
+        self._last_lag = {}
+        self._cost = {}  # symbol -> moving average of compute time (seconds)
+        self._lock = threading.Lock()
+        self.degraded = False
+        self._clean_cycles = 0
+        self.counters = {
+            'cycles': 0, 'computed_hot': 0, 'computed_cold': 0, 'coalesced_ticks': 0,
+            'skipped_book_only': 0, 'deferred': 0, 'budget_misses': 0,
+        }
+        self._cycle_ms = 0.0
+
+    def policy(self, symbol):
+        """(priority, latency budget in seconds) for a symbol."""
+        policy = self._policies.get(symbol)
+        if policy is None:
+            entry = self.symbol_config.get(symbol, {})
+            priority = entry.get('priority', self.default_priority)
+            budget = entry.get('latency_budget_ms', _DEFAULT_BUDGETS[priority])
+            policy = self._policies[symbol] = (priority, budget / 1000)
+        return policy
+
+    def mark(self, symbol, kind):
+        """Record a new tick for a symbol: kind is "trade" or "book"."""
+        with self._lock:
+            pending = self._pending.get(symbol)
+            if pending is None:
+                pending = self._pending[symbol] = {'trades': 0, 'books': 0, 'since': time.monotonic()}
+            pending['trades' if kind == 'trade' else 'books'] += 1
+
+    def _take(self, symbol, priority, budget, start):
+        with self._lock:
+            pending = self._pending.pop(symbol)
+        lag = start - pending['since']
+        self._last_lag[symbol] = lag
+        self.counters['coalesced_ticks'] += pending['trades'] + pending['books'] - 1
+        if lag > budget:
+            self.counters['budget_misses'] += 1
+            return priority == 'hot'
+        return False
+
+    def _compute(self, compute, symbol):
+        start = time.monotonic()
+        compute(symbol)
+        end = self._last_computed[symbol] = time.monotonic()
+        self._cost[symbol] = 0.8 * self._cost.get(symbol, end - start) + 0.2 * (end - start)
+
+    def run_cycle(self, compute, backlog=0):
+        """Call compute(symbol) for the symbols due this cycle, most urgent first.
+
+        backlog is the number of messages still queued after this cycle's intake.
+        """
+        start = time.monotonic()
+        with self._lock:
+            pending = [(symbol, dict(state)) for symbol, state in self._pending.items()]
+        hot, cold = [], []
+        for symbol, state in pending:
+            priority, budget = self.policy(symbol)
+            if self.degraded and state['trades'] == 0:
+                # Degraded: a book-only change waits for the next trade of that symbol
+                with self._lock:
+                    self._pending.pop(symbol, None)
+                self.counters['skipped_book_only'] += 1
+            elif priority == 'hot':
+                hot.append((state['since'], symbol, budget))
+            elif start - state['since'] >= min(self.cold_interval, budget):
+                cold.append((state['since'] + budget, symbol, budget))
+        hot.sort()
+        cold.sort()  # Closest to (or furthest past) its budget first
+        # A cycle may take as long as the tightest hot budget
+        deadline = start + min((budget for _, _, budget in hot), default=HOT_LATENCY_BUDGET_MS / 1000)
+
+        hot_missed = False
+        for _, symbol, budget in hot:
+            hot_missed |= self._take(symbol, 'hot', budget, time.monotonic())
+            self._compute(compute, symbol)
+            self.counters['computed_hot'] += 1
+        forced = False
+        for due, symbol, budget in cold:
+            now = time.monotonic()
+            if now + self._cost.get(symbol, 0.0) > deadline:
+                # Would not finish in time. It stays pending with first pick next cycle, except that
+                # one symbol already past its own budget goes ahead so cold symbols never starve.
+                if forced or now <= due:
+                    self.counters['deferred'] += 1
+                    continue
+                forced = True
+            self._take(symbol, 'cold', budget, now)
+            self._compute(compute, symbol)
+            self.counters['computed_cold'] += 1
+
+        elapsed = time.monotonic() - start
+        self.counters['cycles'] += 1
+        if hot or cold:
+            self._cycle_ms = 0.9 * self._cycle_ms + 0.1 * elapsed * 1000
+        overloaded = hot_missed or backlog > BACKLOG_LIMIT or elapsed > deadline - start
+        self._clean_cycles = 0 if overloaded else self._clean_cycles + 1
+        if overloaded and not self.degraded:
+            self.degraded = True
+            logger.warning(
+                f"Compute over budget (cycle {elapsed * 1000:.1f}ms, backlog {backlog}, "
+                f"hot miss {hot_missed}); skipping book-only recomputes"
+            )
+        elif self.degraded and self._clean_cycles >= RECOVERY_CYCLES:
+            self.degraded = False
+            logger.info("Compute back within budget; book-only recomputes resumed")
+
+    def get_metrics(self):
+        """Scheduler decisions and per-symbol freshness, for the profiling gauges."""
+        now = time.monotonic()
+        with self._lock:
+            pending = {symbol: dict(state) for symbol, state in self._pending.items()}
+        symbols = {}
+        for symbol in set(pending) | set(list(self._last_computed)):
+            priority, budget = self.policy(symbol)
+            state = pending.get(symbol)
+            symbols[symbol] = {
+                'priority': priority,
+                'latency_budget_ms': round(budget * 1000, 1),
+                'pending_ticks': state['trades'] + state['books'] if state else 0,
+                'waiting_ms': round((now - state['since']) * 1000, 1) if state else 0.0,
+                'last_lag_ms': round(self._last_lag.get(symbol, 0.0) * 1000, 1),
+                'compute_ms': round(self._cost.get(symbol, 0.0) * 1000, 2),
+            }
+        return dict(self.counters, degraded=self.degraded, cycle_ms=round(self._cycle_ms, 2), symbols=symbols)
+
+
+# Shared scheduler used by process_trades
+compute_scheduler = ComputeScheduler()
@@ -21,6 +21,11 @@ logger.addHandler(sh)
 
 # n8n webhook URL
 N8N_WEBHOOK_URL = "http://localhost:5678/webhook/pythonindicators"
+# n8n webhook URL for individual signal events
+N8N_EVENT_WEBHOOK_URL = "http://localhost:5678/webhook/pythonsignals"
+
+# Keep-alive session so each event does not pay for a new connection
+event_session = requests.Session()
 
 def send_to_n8n(file_path="ai_data.json"):
     try:
@@ -37,5 +42,16 @@ def send_to_n8n(file_path="ai_data.json"):
     except Exception as e:
         logger.error(f"Error sending data to n8n: {e}")
 
+def send_event_to_n8n(event):
+    try:
+        response = event_session.post(N8N_EVENT_WEBHOOK_URL, json=event, timeout=5)
+        if response.status_code == 200:
+            logger.info(f"Signal event {event['event']} for {event['symbol']} sent to n8n")
+            return True
+        logger.warning(f"Failed to send signal event to n8n: {response.status_code} - {response.text}")
+    except Exception as e:
+        logger.error(f"Error sending signal event to n8n: {e}")
+    return False
+
 if __name__ == "__main__":
     send_to_n8n()
\ No newline at end of file
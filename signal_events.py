@@ -0,0 +1,155 @@
+import logging
+import time
+from collections import deque
+from queue import Queue, Empty
+from threading import Thread
+
+from send_to_n8n import send_event_to_n8n
+from time_utils import format_ns
+
+# Configure logging for signal_events.py
+logger = logging.getLogger("signal_events")
+logger.setLevel(logging.INFO)
+
+# File handler for signal_events.log
+fh = logging.FileHandler('signal_events.log')
+fh.setLevel(logging.INFO)
+formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+fh.setFormatter(formatter)
+logger.addHandler(fh)
+
+# Stream handler for console output
+sh = logging.StreamHandler()
+sh.setLevel(logging.INFO)
+sh.setFormatter(formatter)
+logger.addHandler(sh)
+
+# Conditions checked on every latest_data row. Types:
+#   cross_above / cross_below: field crosses a number or another field ("ref")
+#   change: field takes a new value (values in "ignore" are not reported)
+EVENT_CONDITIONS = [
+    {'name': 'buy_signal', 'type': 'cross_above', 'field': 'buy', 'threshold': 7},
+    {'name': 'sell_signal', 'type': 'cross_above', 'field': 'sell', 'threshold': 7},
+    {'name': 'trend_flip', 'type': 'change', 'field': 'trend', 'ignore': ['N/A']},
+    {'name': 'rsi_oversold', 'type': 'cross_below', 'field': 'rsi', 'threshold': 30},
+    {'name': 'rsi_overbought', 'type': 'cross_above', 'field': 'rsi', 'threshold': 70},
+    {'name': 'bb_upper_breach', 'type': 'cross_above', 'field': 'current_price', 'ref': 'bb_upper'},
+    {'name': 'bb_lower_breach', 'type': 'cross_below', 'field': 'current_price', 'ref': 'bb_lower'},
+]
+# Minimum time between two events of the same condition for one symbol
+DEBOUNCE_SECONDS = 30
+# Recent rows sent along with each event (0 disables the context window)
+CONTEXT_ROWS = 20
+CONTEXT_FIELDS = ['timestamp', 'current_price', 'trend', 'buy', 'sell', 'rsi', 'macd_diff', 'bb_upper', 'bb_lower']
+
+# Events waiting to be posted, so HTTP never blocks indicator computation
+event_queue = Queue()
+
+# Per-symbol state: previous row, context window and debounce bookkeeping
+_symbol_state = {}
+_enabled = False
+
+
+def enable_events():
+    """Switch on condition checks; called by main when the n8n event mode is active."""
+    global _enabled
+    _enabled = True
+
+
+def _reference(row, condition):
+    if 'ref' in condition:
+        return row.get(condition['ref'])
+    return condition.get('threshold')
+
+
+def _triggered(condition, previous, current):
+    field = condition['field']
+    before, now = previous.get(field), current.get(field)
+    if before is None or now is None:
+        return False
+    if condition['type'] == 'change':
+        return before != now and now not in condition.get('ignore', [])
+    ref_before, ref_now = _reference(previous, condition), _reference(current, condition)
+    if ref_before is None or ref_now is None:
+        return False
+    if condition['type'] == 'cross_above':
+        return before < ref_before and now >= ref_now
+    if condition['type'] == 'cross_below':
+        return before > ref_before and now <= ref_now
+    return False
+
+
+def check_signals(row):
+    """Compare a new latest_data row with the previous one for its symbol and queue triggered events."""
+    if not _enabled or not row.get('loaded'):
+        return
+    state = _symbol_state.setdefault(row['symbol'], {
+        'previous': None,
+        'context': deque(maxlen=CONTEXT_ROWS) if CONTEXT_ROWS else None,
+        'last_fired': {},
+        'suppressed': {}
+    })
+    context = state['context']
+    if context is not None and (not context or context[-1]['timestamp'] != row['timestamp']):
+        context.append({field: row.get(field) for field in CONTEXT_FIELDS})
+
+    previous = state['previous']
+    state['previous'] = row
+    if previous is None:
+        return
+
+    now = time.monotonic()
+    for condition in EVENT_CONDITIONS:
+        if not _triggered(condition, previous, row):
+            continue
+        name = condition['name']
+        debounce = condition.get('debounce_seconds', DEBOUNCE_SECONDS)
+        last_fired = state['last_fired'].get(name)
+        if last_fired is not None and now - last_fired < debounce:
+            state['suppressed'][name] = state['suppressed'].get(name, 0) + 1
+            continue
+        event = {
+            'event': name,
+            'symbol': row['symbol'],
+            'timestamp': row['timestamp'],
+            'time': format_ns(row['timestamp']),
+            'field': condition['field'],
+            'previous': previous.get(condition['field']),
+            'current': row.get(condition['field']),
+            'reference': _reference(row, condition),
+            'debounce': {
+                'seconds': debounce,
+                'seconds_since_last': None if last_fired is None else round(now - last_fired, 3),
+                'suppressed_since_last': state['suppressed'].pop(name, 0)
+            },
+            'data': {key: value for key, value in row.items() if key != 'loaded'},
+            'context': list(context) if context is not None else []
+        }
+        state['last_fired'][name] = now
+        event_queue.put(event)
+        logger.info(f"Signal event {name} for {row['symbol']}: {event['previous']} -> {event['current']}")
+
+
+def process_events():
+    """Post queued signal events to the n8n event webhook as soon as they arrive."""
+    logger.info("Starting signal event sender...")
+    while True:
+        try:
+            event = event_queue.get(timeout=5)
+        except Empty:
+            continue
+        try:
+            send_event_to_n8n(event)
+        except Exception as e:
+            logger.error(f"Error sending signal event: {e}")
+
+
+if __name__ == "__main__":
+    enable_events()
+    sender_thread = Thread(target=process_events, daemon=True)
+    sender_thread.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        logger.info("Shutting down signal events...")
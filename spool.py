@@ -0,0 +1,239 @@
+import bisect
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+# Configure logging for spool.py
+logger = logging.getLogger("spool")
+logger.setLevel(logging.INFO)
+
+# File handler for spool.log
+fh = logging.FileHandler('spool.log')
+fh.setLevel(logging.INFO)
+formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+fh.setFormatter(formatter)
+logger.addHandler(fh)
+
+# Stream handler for console output
+sh = logging.StreamHandler()
+sh.setLevel(logging.INFO)
+sh.setFormatter(formatter)
+logger.addHandler(sh)
+
+# Rows waiting for MySQL live in SPOOL_DIR/<first seq>.log, one JSON record per line
+SPOOL_DIR = os.environ.get("SPOOL_DIR", "spool")
+SEGMENT_MAX_BYTES = 16 * 1024 * 1024
+# "always": fsync every append (a row is on disk before compute_symbol moves on),
+# "interval": fsync at most every FSYNC_INTERVAL_SECONDS, "off": leave it to the OS
+FSYNC_POLICY = os.environ.get("SPOOL_FSYNC", "always")
+FSYNC_INTERVAL_SECONDS = 1
+
+_SEGMENT_SUFFIX = '.log'
+# Random id of this spool directory; checkpoints are kept per id so a wiped spool starts clean
+_ID_FILE = 'spool_id'
+# Last sequence number known to be stored, so numbering continues after drained segments are deleted
+_CHECKPOINT_FILE = 'checkpoint'
+# Rows MySQL rejected (bad values), kept for inspection instead of blocking the drain
+_REJECTED_FILE = 'rejected.jsonl'
+# Held with flock while a process has the spool open; a second writer or drainer would duplicate rows
+_LOCK_FILE = 'lock'
+
+
+def _segment_path(directory, first_seq):
+    return os.path.join(directory, f"{first_seq:020d}{_SEGMENT_SUFFIX}")
+
+
+class SpoolLockedError(Exception):
+    """Another process has the spool directory open."""
+
+
+class Spool:
+    """Segmented append-only log of rows on their way to MySQL.
+
+    Every record gets an increasing sequence number. The drainer reads records after its
+    checkpoint and calls commit() once they are stored; fully drained segments are deleted.
+    Only one Spool may have a directory open at a time; the next one raises SpoolLockedError.
+    """
+
+    def __init__(self, directory=SPOOL_DIR, segment_max_bytes=SEGMENT_MAX_BYTES, fsync_policy=FSYNC_POLICY):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync_policy = fsync_policy
+        self._lock = threading.Lock()
+        self._last_fsync = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        # Taken before anything is read: recovery truncates the tail another process may be writing
+        self._lock_file = open(os.path.join(directory, _LOCK_FILE), 'a')
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            raise SpoolLockedError(f"Spool {directory} is in use by another process")
+
+        id_path = os.path.join(directory, _ID_FILE)
+        if not os.path.exists(id_path):
+            self._write_atomic(id_path, uuid.uuid4().hex)
+        with open(id_path) as f:
+            self.spool_id = f.read().strip()
+
+        self.committed_seq = self._read_checkpoint()
+        self._segments = sorted(
+            int(name[:-len(_SEGMENT_SUFFIX)]) for name in os.listdir(directory) if name.endswith(_SEGMENT_SUFFIX)
+        )
+        self.last_seq = self.committed_seq
+        if self._segments:
+            self.last_seq = max(self.last_seq, self._recover_tail())
+        self._file = None
+        # Reader position: (segment first seq, byte offset, last seq read before that offset)
+        self._cursor = None
+        pending = self.last_seq - self.committed_seq
+        if pending:
+            logger.info(f"Spool {directory} has {pending} rows from a previous run to replay")
+
+    def _write_atomic(self, path, text):
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _read_checkpoint(self):
+        try:
+            with open(os.path.join(self.directory, _CHECKPOINT_FILE)) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _recover_tail(self):
+        """Cut a record torn by a crash off the last segment and return the last complete seq."""
+        path = _segment_path(self.directory, self._segments[-1])
+        with open(path, 'rb') as f:
+            data = f.read()
+        good = data.rfind(b'\n') + 1
+        if good < len(data):
+            logger.warning(f"Truncating {len(data) - good} bytes of a partial record in {path}")
+            with open(path, 'r+b') as f:
+                f.truncate(good)
+        last_line = data[:good].rstrip(b'\n').rsplit(b'\n', 1)[-1]
+        if not last_line:
+            return self._segments[-1] - 1
+        return json.loads(last_line)['seq']
+
+    def _open_for_append(self):
+        if self._file is None or self._file.tell() >= self.segment_max_bytes:
+            if self._file is not None:
+                self._file.close()
+                # Continue in a fresh segment so drained ones can be deleted whole
+                self._segments.append(self.last_seq + 1)
+            elif not self._segments:
+                self._segments.append(self.last_seq + 1)
+            self._file = open(_segment_path(self.directory, self._segments[-1]), 'ab')
+        return self._file
+
+    def append(self, rows):
+        """Append rows (JSON-serializable dicts) and make them durable per the fsync policy.
+
+        Returns the sequence number of the last row. If the write fails the OSError is raised
+        and the spool is left as it was, so the same rows can be appended again.
+        """
+        with self._lock:
+            f = self._open_for_append()
+            first_seq = self.last_seq
+            lines = []
+            for row in rows:
+                seq = first_seq + len(lines) + 1
+                lines.append(json.dumps({'seq': seq, 'row': row}, separators=(',', ':')))
+            start = f.tell()
+            try:
+                f.write(("\n".join(lines) + "\n").encode())
+                f.flush()
+                now = time.monotonic()
+                if self.fsync_policy == "always" or (
+                    self.fsync_policy == "interval" and now - self._last_fsync >= FSYNC_INTERVAL_SECONDS
+                ):
+                    os.fsync(f.fileno())
+                    self._last_fsync = now
+            except OSError:
+                # Disk full or I/O error: cut off what was written so no torn record sits mid-segment
+                self._file = None
+                try:
+                    f.close()
+                except OSError:
+                    pass
+                with open(f.name, 'r+b') as segment:
+                    segment.truncate(start)
+                raise
+            self.last_seq = first_seq + len(lines)
+            return self.last_seq
+
+    def read(self, after_seq, limit):
+        """Return up to limit (seq, row) records with seq > after_seq, in order."""
+        with self._lock:
+            segments = list(self._segments)
+        if not segments:
+            return []
+        if self._cursor and self._cursor[2] == after_seq and self._cursor[0] in segments:
+            position = segments.index(self._cursor[0])
+            offset = self._cursor[1]
+        else:
+            position = max(bisect.bisect_right(segments, after_seq + 1) - 1, 0)
+            offset = 0
+
+        records = []
+        last_read = after_seq
+        while position < len(segments) and len(records) < limit:
+            segment = segments[position]
+            with open(_segment_path(self.directory, segment), 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break  # Being written right now
+                    offset += len(line)
+                    record = json.loads(line)
+                    if record['seq'] <= after_seq:
+                        continue
+                    records.append((record['seq'], record['row']))
+                    last_read = record['seq']
+                    if len(records) >= limit:
+                        break
+            if len(records) >= limit or position == len(segments) - 1:
+                break
+            position += 1
+            offset = 0
+        self._cursor = (segments[position], offset, last_read)
+        return records
+
+    def commit(self, seq):
+        """Record that every row up to seq is stored and delete segments that are fully drained."""
+        with self._lock:
+            self.committed_seq = seq
+            self._write_atomic(os.path.join(self.directory, _CHECKPOINT_FILE), str(seq))
+            # A segment is drained when the next one starts at or before seq + 1; the last one stays open
+            while len(self._segments) > 1 and self._segments[1] <= seq + 1:
+                os.remove(_segment_path(self.directory, self._segments.pop(0)))
+
+    def reject(self, seq, row, reason):
+        """Set aside a row MySQL refuses, so draining can go on without losing it."""
+        with self._lock:
+            with open(os.path.join(self.directory, _REJECTED_FILE), 'a') as f:
+                f.write(json.dumps({'seq': seq, 'reason': reason, 'row': row}) + "\n")
+
+    def pending(self):
+        """Rows appended but not yet committed."""
+        return self.last_seq - self.committed_seq
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+            if not self._lock_file.closed:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                self._lock_file.close()
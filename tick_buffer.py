@@ -0,0 +1,116 @@
+import threading
+
+import numpy as np
+
+# Ticks kept per symbol (the indicator window is taken from the newest of these)
+TICK_BUFFER_CAPACITY = 5000
+# Indicator window: the newest MAX_TRADES ticks, once a symbol has at least MIN_TRADES
+MAX_TRADES = 60
+MIN_TRADES = 30
+
+
+class TickBuffer:
+    """Time-ordered trade ticks for one symbol, backed by preallocated typed arrays.
+
+    Storage is twice the capacity and writes move forward through it; when the end is
+    reached the newest ticks are copied back to the front. The last n ticks are therefore
+    always contiguous and window() can hand out views without copying.
+    """
+
+    def __init__(self, symbol, capacity=TICK_BUFFER_CAPACITY):
+        self.symbol = symbol
+        self.capacity = capacity
+        self._ts = np.zeros(2 * capacity, dtype=np.int64)
+        self._price = np.zeros(2 * capacity, dtype=np.float64)
+        self._size = np.zeros(2 * capacity, dtype=np.float64)
+        self._end = 0
+        self._count = 0
+        # Write counters used by snapshot() to detect overlapping writes
+        self._appended = 0
+        self._inserted = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def last_timestamp(self):
+        return int(self._ts[self._end - 1]) if self._count else None
+
+    def _compact(self):
+        start = self._end - self._count
+        for array in (self._ts, self._price, self._size):
+            array[:self._count] = array[start:self._end]
+        self._end = self._count
+
+    def append(self, ts, price, size):
+        """Add a tick; late ticks are inserted at their slot so the buffer stays ordered.
+
+        Returns False if the tick is older than everything in a full buffer and was dropped.
+        """
+        with self._lock:
+            end, count = self._end, self._count
+            if count and ts < self._ts[end - 1]:
+                start = end - count
+                pos = start + int(np.searchsorted(self._ts[start:end], ts, side='right'))
+                if count == self.capacity:
+                    if pos == start:
+                        return False
+                    # Drop the oldest tick to make room below the insert point
+                    for array, value in ((self._ts, ts), (self._price, price), (self._size, size)):
+                        array[start:pos - 1] = array[start + 1:pos]
+                        array[pos - 1] = value
+                else:
+                    if end == len(self._ts):
+                        self._compact()
+                        pos -= start
+                        end = self._end
+                    for array, value in ((self._ts, ts), (self._price, price), (self._size, size)):
+                        array[pos + 1:end + 1] = array[pos:end]
+                        array[pos] = value
+                    self._end = end + 1
+                    self._count = count + 1
+                self._inserted += 1
+                return True
+
+            if end == len(self._ts):
+                self._compact()
+                end = self._end
+            self._ts[end] = ts
+            self._price[end] = price
+            self._size[end] = size
+            self._end = end + 1
+            self._count = min(count + 1, self.capacity)
+            self._appended += 1
+            return True
+
+    def window(self, n=None):
+        """Return (timestamps, prices, sizes) views of the newest n ticks without copying.
+
+        The views alias the buffer, so they are only stable for the writer thread itself;
+        other threads should use snapshot().
+        """
+        with self._lock:
+            end, count = self._end, self._count
+        n = count if n is None else min(n, count)
+        return self._ts[end - n:end], self._price[end - n:end], self._size[end - n:end]
+
+    def snapshot(self, n=None):
+        """Return a consistent copy of the newest n ticks for readers on other threads.
+
+        Only the bounds are read under the lock; the copy happens outside it and is retried
+        if a writer touched the copied slots in the meantime.
+        """
+        while True:
+            with self._lock:
+                end, count = self._end, self._count
+                appended, inserted = self._appended, self._inserted
+            size = count if n is None else min(n, count)
+            copies = (
+                self._ts[end - size:end].copy(),
+                self._price[end - size:end].copy(),
+                self._size[end - size:end].copy()
+            )
+            with self._lock:
+                if self._inserted == inserted and self._appended - appended <= self.capacity - size:
+                    return copies
@@ -0,0 +1,44 @@
+import calendar
+import time
+from datetime import datetime, timedelta, timezone
+
+NS_PER_SECOND = 1_000_000_000
+
+
+def parse_time_exchange(value):
+    """Parse a CoinAPI ISO 8601 timestamp (e.g. 2025-02-28T02:57:08.1234567Z) to epoch nanoseconds.
+
+    Returns None when the value is missing or malformed.
+    """
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        text = value.rstrip('Z')
+        if '+' in text[10:]:
+            # Only UTC is sent by CoinAPI; drop an explicit +00:00 offset
+            text = text[:10] + text[10:].split('+', 1)[0]
+        seconds_part, _, fraction = text.partition('.')
+        seconds = calendar.timegm(time.strptime(seconds_part, '%Y-%m-%dT%H:%M:%S'))
+        fraction = (fraction + '000000000')[:9] if fraction else '0'
+        return seconds * NS_PER_SECOND + int(fraction)
+    except ValueError:
+        return None
+
+
+def ns_to_datetime(ns):
+    """Convert epoch nanoseconds to a UTC datetime (microsecond precision, as stored in DATETIME(6))."""
+    return datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(microseconds=ns // 1000)
+
+
+def datetime_to_ns(value):
+    """Convert a datetime (naive values are taken as UTC) to epoch nanoseconds."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    delta = value - datetime(1970, 1, 1, tzinfo=timezone.utc)
+    return (delta.days * 86400 + delta.seconds) * NS_PER_SECOND + delta.microseconds * 1000
+
+
+def format_ns(ns):
+    """Format epoch nanoseconds as ISO 8601 text with full nanosecond precision."""
+    seconds, remainder = divmod(ns, NS_PER_SECOND)
+    return f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds))}.{remainder:09d}Z"
@@ -1,19 +1,25 @@
 import pandas as pd
-from ta.trend import MACD
-from ta.momentum import RSIIndicator, StochasticOscillator
-from ta.volatility import BollingerBands
 from websocket_trades import trade_queue
 import logging
 import time
 import json
 from datetime import datetime
-from collections import deque
 import sys
 import threading
-from queue import Queue
+from collections import deque
+from queue import Empty
 import importlib.util
 import os
 
+from data_cache import add_row as add_to_read_cache, mark_cache_active
+from indicator_engine import STORAGE_KEYS, compute_indicators
+from orderbook_store import book_store
+from scheduler import compute_scheduler
+from signal_events import check_signals
+from spool import Spool
+from tick_buffer import MAX_TRADES, MIN_TRADES, TickBuffer
+from time_utils import format_ns
+
 # Configure standard logger for web_dashboard.py
 logger = logging.getLogger("web_dashboard")
 logger.setLevel(logging.INFO)
@@ -46,16 +52,60 @@ detailed_formatter = logging.Formatter(
 detailed_fh.setFormatter(detailed_formatter)
 detailed_logger.addHandler(detailed_fh)
 
-# Queue to pass data to MySQL script
-mysql_queue = Queue()
+# Rows for MySQL go straight to the disk spool; mysql_storage.drain_spool writes them out.
+# Opened by open_row_spool() when processing starts, not on import: one process per spool directory.
+row_spool = None
+# Rows that could not be spooled (disk full, I/O error) are retried with the next row; beyond
+# this many the oldest are dropped so a dead disk cannot exhaust memory
+SPOOL_RETRY_ROWS = 10000
+_unspooled = deque()
+spool_stats = {'errors': 0, 'dropped': 0, 'held': 0}
 
 # Data storage
-MAX_TRADES = 60
-trades = deque(maxlen=MAX_TRADES)
+trade_buffers = {}  # symbol -> TickBuffer
+latest_books = {}  # symbol -> latest book50 update
 latest_data = {'loaded': False}
 latest_trade = {}
+first_print = True
+# Messages taken from trade_queue per cycle, and how long an idle cycle waits for one
+MAX_INTAKE_MESSAGES = 1000
+IDLE_WAIT_SECONDS = 0.05
 data_lock = threading.Lock()
 
+def open_row_spool():
+    """Open the spool for MySQL rows on first use; raises SpoolLockedError if another process has it."""
+    global row_spool
+    with data_lock:
+        if row_spool is None:
+            row_spool = Spool()
+    return row_spool
+
+def spool_row(row):
+    """Append a row to the spool; a storage failure is logged and never stops indicator computation."""
+    if len(_unspooled) >= SPOOL_RETRY_ROWS:
+        _unspooled.popleft()
+        spool_stats['dropped'] += 1
+    _unspooled.append(dict(row))
+    try:
+        row_spool.append(list(_unspooled))
+    except OSError as e:
+        spool_stats['errors'] += 1
+        spool_stats['held'] = len(_unspooled)
+        logger.error(f"Cannot spool row for MySQL, {len(_unspooled)} rows held in memory for retry: {e}")
+        return
+    if len(_unspooled) > 1:
+        logger.info(f"Spooled {len(_unspooled)} rows held back by an earlier spool error")
+    _unspooled.clear()
+    spool_stats['held'] = 0
+
+def get_trade_buffer(symbol):
+    """Return the tick buffer for a symbol, creating it on first use."""
+    buffer = trade_buffers.get(symbol)
+    if buffer is None:
+        with data_lock:
+            buffer = trade_buffers.setdefault(symbol, TickBuffer(symbol))
+    return buffer
+
 def calculate_trend(df):
     if len(df) < 5:
         return "N/A"
@@ -77,23 +127,29 @@ def calculate_recommendations(df):
     sell_score = 0
     hold_score = 5
 
-    rsi = latest['RSI']
-    if rsi < 30: buy_score += 4
-    elif rsi > 70: sell_score += 4
+    # Rules whose indicators are not configured for this deployment are skipped
+    if 'RSI' in df:
+        rsi = latest['RSI']
+        if rsi < 30: buy_score += 4
+        elif rsi > 70: sell_score += 4
 
-    macd_diff = latest['MACD_diff']
-    if macd_diff > 0 and df['MACD_diff'].iloc[-2] <= 0: buy_score += 3
-    elif macd_diff < 0 and df['MACD_diff'].iloc[-2] >= 0: sell_score += 3
+    if 'MACD_diff' in df:
+        macd_diff = latest['MACD_diff']
+        if macd_diff > 0 and df['MACD_diff'].iloc[-2] <= 0: buy_score += 3
+        elif macd_diff < 0 and df['MACD_diff'].iloc[-2] >= 0: sell_score += 3
 
-    if current_price < latest['BB_lower']: buy_score += 3
-    elif current_price > latest['BB_upper']: sell_score += 3
+    if 'BB_lower' in df and 'BB_upper' in df:
+        if current_price < latest['BB_lower']: buy_score += 3
+        elif current_price > latest['BB_upper']: sell_score += 3
 
-    stoch_k = latest['Stoch_K']
-    if stoch_k < 20: buy_score += 3
-    elif stoch_k > 80: sell_score += 3
+    if 'Stoch_K' in df:
+        stoch_k = latest['Stoch_K']
+        if stoch_k < 20: buy_score += 3
+        elif stoch_k > 80: sell_score += 3
 
-    if latest['MA5'] > latest['MA10'] and df['MA5'].iloc[-2] <= df['MA10'].iloc[-2]: buy_score += 2
-    elif latest['MA5'] < latest['MA10'] and df['MA5'].iloc[-2] >= df['MA10'].iloc[-2]: sell_score += 2
+    if 'MA5' in df and 'MA10' in df:
+        if latest['MA5'] > latest['MA10'] and df['MA5'].iloc[-2] <= df['MA10'].iloc[-2]: buy_score += 2
+        elif latest['MA5'] < latest['MA10'] and df['MA5'].iloc[-2] >= df['MA10'].iloc[-2]: sell_score += 2
 
     buy_score = min(10, max(1, buy_score))
     sell_score = min(10, max(1, sell_score))
@@ -102,18 +158,120 @@ def calculate_recommendations(df):
     return buy_score, sell_score, hold_score
 
 
+def compute_symbol(symbol):
+    """Recompute one symbol's indicators and publish the row to the dashboard, signals and storage."""
+    global latest_data, first_print
+    buffer = trade_buffers.get(symbol)
+    if buffer is None or len(buffer) < MIN_TRADES:
+        if first_print:
+            sys.stdout.write(f"Waiting for initial data ({MIN_TRADES} trades required)...\n")
+            sys.stdout.flush()
+            first_print = False
+        return None
+
+    start = time.time()
+
+    # Same thread as the writer, so the zero-copy window is stable while we build the frame
+    timestamps, prices, sizes = buffer.window(MAX_TRADES)
+    df = pd.DataFrame({'timestamp': timestamps, 'price': prices, 'size': sizes})
+
+    # Fill NaN in raw data (just in case)
+    df['price'] = df['price'].fillna(0.0)
+    df['size'] = df['size'].fillna(0.0)
+
+    # Only the configured indicators are computed, shared intermediates once per cycle
+    df = compute_indicators(df)
+
+    spread = imbalance = 0.0
+    latest_book = latest_books.get(symbol)
+    if latest_book and latest_book['bids'] and latest_book['asks']:
+        best_bid = max(latest_book['bids'], key=lambda x: x['price'])['price']
+        best_ask = min(latest_book['asks'], key=lambda x: x['price'])['price']
+        spread = best_ask - best_bid
+        imbalance = sum(bid['size'] for bid in latest_book['bids'][:5]) / sum(ask['size'] for ask in latest_book['asks'][:5])
+
+    latest = df.iloc[-1]
+    buy, sell, hold = calculate_recommendations(df)
+    trend = calculate_trend(df)
+
+    with data_lock:
+        processing_time = time.time() - start
+        latest_data = {
+            'loaded': True,
+            'current_price': round(float(latest['price']), 8),
+            'timestamp': int(latest['timestamp']),
+            'trend': trend,
+            'buy': buy,
+            'sell': sell,
+            'hold': hold,
+            'symbol': symbol,
+            'processing_time': round(processing_time, 4),
+            'spread': round(spread, 8),
+            'imbalance': round(imbalance, 8)
+        }
+        # Indicators not configured for this deployment are stored as 0.0
+        for column, key in STORAGE_KEYS.items():
+            latest_data[key] = round(float(latest[column]), 8) if column in df else 0.0
+
+        # Debug log to inspect data before queuing
+        logger.debug(f"Prepared latest_data for MySQL: {json.dumps(latest_data)}")
+
+    logger.info(f"Indicators calculated - Processing took {processing_time:.3f}s")
+    check_signals(latest_data)
+    # ... (detailed_logger unchanged) ...
+
+    # On disk (per the spool's fsync policy) before the next symbol is computed
+    spool_row(latest_data)
+    add_to_read_cache(latest_data)
+    logger.info("Data spooled for MySQL storage")
+
+    # ... (console output unchanged) ...
+
+    output = (
+        f"\rNew Trade - Symbol: {latest_data['symbol']:<20} Price: {latest_data['current_price']:<10.4f} Size: {latest['size']:<10.2f}\n"
+        f"Dashboard Data:\n"
+        f"  Price    : {latest_data['current_price']:<10.4f}  Trend: {latest_data['trend']:<5}\n"
+        f"  Buy      : {latest_data['buy']:<3}  Sell: {latest_data['sell']:<3}  Hold: {latest_data['hold']:<3}\n"
+        f"  MA5      : {latest_data['ma5']:<10.4f}  MA10: {latest_data['ma10']:<10.4f}\n"
+        f"  MA15     : {latest_data['ma15']:<10.4f}  MA30: {latest_data['ma30']:<10.4f}\n"
+        f"  MACD     : {latest_data['macd']:<10.4f}  Signal: {latest_data['macd_signal']:<10.4f}  Diff: {latest_data['macd_diff']:<10.4f}\n"
+        f"  Volume   : {latest_data['volume']:<10.2f}\n"
+        f"  RSI      : {latest_data['rsi']:<10.2f}\n"
+        f"  BB Upper : {latest_data['bb_upper']:<10.4f}  Middle: {latest_data['bb_middle']:<10.4f}  Lower: {latest_data['bb_lower']:<10.4f}\n"
+        f"  Stoch %K : {latest_data['stoch_k']:<10.2f}  %D: {latest_data['stoch_d']:<10.2f}\n"
+        f"  VWAP     : {latest_data['vwap']:<10.4f}\n"
+        f"  Spread   : {latest_data['spread']:<10.4f}  Imbalance: {latest_data['imbalance']:<10.2f}\n"
+        f"  Timestamp: {format_ns(latest_data['timestamp'])}"
+    )
+    sys.stdout.write(output)
+    sys.stdout.flush()
+    return latest_data
+
+
 def process_trades():
-    global trades, latest_data, latest_trade
-    first_print = True
-    latest_book = None
+    global latest_trade
     timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())
     logger.info("Starting trade processing...")
+    open_row_spool()
+    mark_cache_active()
     while True:
-        if not trade_queue.empty():
-            data_type, data = trade_queue.get()
+        # Take everything that has arrived; the scheduler then decides what to recompute
+        try:
+            messages = [trade_queue.get(timeout=IDLE_WAIT_SECONDS)]
+        except Empty:
+            messages = []
+        while messages and len(messages) < MAX_INTAKE_MESSAGES:
+            try:
+                messages.append(trade_queue.get_nowait())
+            except Empty:
+                break
+
+        for data_type, data in messages:
             if data_type == "trade":
+                # The buffer keeps ticks ordered, late trades are inserted into their slot
+                get_trade_buffer(data['symbol']).append(data['timestamp'], data['price'], data['size'])
+                compute_scheduler.mark(data['symbol'], "trade")
                 with data_lock:
-                    trades.append(data)
                     latest_trade = data.copy()
                 logger.info(f"Trade received: {data['symbol']} at {data['price']:.4f}")
                 detailed_logger.info(
@@ -121,133 +279,24 @@ def process_trades():
                     extra={
                         'data_received': json.dumps(data),
                         'time': timestamp,
-                        'next_step': 'Adding trade to trades deque for indicator calculation'
+                        'next_step': 'Adding trade to tick buffer for indicator calculation'
                     }
                 )
             elif data_type == "book50":
-                latest_book = data
-                # ... (book50 processing unchanged) ...
-
-        if len(trades) < 30:
-            time.sleep(0.1)
-            if first_print:
-                sys.stdout.write("Waiting for initial data (30 trades required)...\n")
-                sys.stdout.flush()
-                first_print = False
-            continue
-
-        start = time.time()
-
-        with data_lock:
-            df = pd.DataFrame(list(trades))
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df = df.sort_values('timestamp')
-
-        # Fill NaN in raw data (just in case)
-        df['price'] = df['price'].fillna(0.0)
-        df['size'] = df['size'].fillna(0.0)
-
-        # Calculate indicators
-        df['MA5'] = df['price'].rolling(window=5, min_periods=5).mean().fillna(0.0)
-        df['MA10'] = df['price'].rolling(window=10, min_periods=10).mean().fillna(0.0)
-        df['MA15'] = df['price'].rolling(window=15, min_periods=15).mean().fillna(0.0)
-        df['MA30'] = df['price'].rolling(window=30, min_periods=30).mean().fillna(0.0)
-
-        macd = MACD(df['price'])
-        df['MACD'] = macd.macd().fillna(0.0)
-        df['MACD_signal'] = macd.macd_signal().fillna(0.0)
-        df['MACD_diff'] = macd.macd_diff().fillna(0.0)
-
-        df['Volume'] = df['size'].cumsum().fillna(0.0)
-
-        rsi = RSIIndicator(df['price'], window=14)
-        df['RSI'] = rsi.rsi().fillna(0.0)
-
-        bb = BollingerBands(df['price'], window=20, window_dev=2)
-        df['BB_upper'] = bb.bollinger_hband().fillna(0.0)
-        df['BB_lower'] = bb.bollinger_lband().fillna(0.0)
-        df['BB_middle'] = bb.bollinger_mavg().fillna(0.0)
-
-        stochastic = StochasticOscillator(df['price'], df['price'], df['price'], window=14, smooth_window=3)
-        df['Stoch_K'] = stochastic.stoch().fillna(0.0)
-        df['Stoch_D'] = stochastic.stoch_signal().fillna(0.0)
-
-        df['VWAP'] = ((df['price'] * df['size']).cumsum() / df['size'].cumsum()).fillna(0.0)
-
-        spread = imbalance = 0.0
-        if latest_book and latest_book['bids'] and latest_book['asks']:
-            best_bid = max(latest_book['bids'], key=lambda x: x['price'])['price']
-            best_ask = min(latest_book['asks'], key=lambda x: x['price'])['price']
-            spread = best_ask - best_bid
-            imbalance = sum(bid['size'] for bid in latest_book['bids'][:5]) / sum(ask['size'] for ask in latest_book['asks'][:5])
-
-        latest = df.iloc[-1]
-        buy, sell, hold = calculate_recommendations(df)
-        trend = calculate_trend(df)
-
-        with data_lock:
-            processing_time = time.time() - start
-            latest_data = {
-                'loaded': True,
-                'current_price': round(float(latest['price']), 8),
-                'timestamp': latest['timestamp'].strftime('%Y-%m-%d %H:%M:%S'),
-                'trend': trend,
-                'buy': buy,
-                'sell': sell,
-                'hold': hold,
-                'ma5': round(float(latest['MA5']), 8),
-                'ma10': round(float(latest['MA10']), 8),
-                'ma15': round(float(latest['MA15']), 8),
-                'ma30': round(float(latest['MA30']), 8),
-                'macd': round(float(latest['MACD']), 8),
-                'macd_signal': round(float(latest['MACD_signal']), 8),
-                'macd_diff': round(float(latest['MACD_diff']), 8),
-                'volume': round(float(latest['Volume']), 8),
-                'rsi': round(float(latest['RSI']), 8),
-                'bb_upper': round(float(latest['BB_upper']), 8),
-                'bb_middle': round(float(latest['BB_middle']), 8),
-                'bb_lower': round(float(latest['BB_lower']), 8),
-                'stoch_k': round(float(latest['Stoch_K']), 8),
-                'stoch_d': round(float(latest['Stoch_D']), 8),
-                'symbol': latest['symbol'],
-                'processing_time': round(processing_time, 4),
-                'vwap': round(float(latest['VWAP']), 8),
-                'spread': round(spread, 8),
-                'imbalance': round(imbalance, 8)
-            }
-
-            # Debug log to inspect data before queuing
-            logger.debug(f"Prepared latest_data for MySQL: {json.dumps(latest_data)}")
-
-        logger.info(f"Indicators calculated - Processing took {processing_time:.3f}s")
-        # ... (detailed_logger unchanged) ...
-
-        mysql_queue.put(latest_data)
-        logger.info("Data queued to mysql_queue for MySQL storage")
-
-        # ... (console output unchanged) ...
-
-        output = (
-            f"\rNew Trade - Symbol: {latest_data['symbol']:<20} Price: {latest_data['current_price']:<10.4f} Size: {latest['size']:<10.2f}\n"
-            f"Dashboard Data:\n"
-            f"  Price    : {latest_data['current_price']:<10.4f}  Trend: {latest_data['trend']:<5}\n"
-            f"  Buy      : {latest_data['buy']:<3}  Sell: {latest_data['sell']:<3}  Hold: {latest_data['hold']:<3}\n"
-            f"  MA5      : {latest_data['ma5']:<10.4f}  MA10: {latest_data['ma10']:<10.4f}\n"
-            f"  MA15     : {latest_data['ma15']:<10.4f}  MA30: {latest_data['ma30']:<10.4f}\n"
-            f"  MACD     : {latest_data['macd']:<10.4f}  Signal: {latest_data['macd_signal']:<10.4f}  Diff: {latest_data['macd_diff']:<10.4f}\n"
-            f"  Volume   : {latest_data['volume']:<10.2f}\n"
-            f"  RSI      : {latest_data['rsi']:<10.2f}\n"
-            f"  BB Upper : {latest_data['bb_upper']:<10.4f}  Middle: {latest_data['bb_middle']:<10.4f}  Lower: {latest_data['bb_lower']:<10.4f}\n"
-            f"  Stoch %K : {latest_data['stoch_k']:<10.2f}  %D: {latest_data['stoch_d']:<10.2f}\n"
-            f"  VWAP     : {latest_data['vwap']:<10.4f}\n"
-            f"  Spread   : {latest_data['spread']:<10.4f}  Imbalance: {latest_data['imbalance']:<10.2f}\n"
-            f"  Timestamp: {latest_data['timestamp']}"
-        )
-        sys.stdout.write(output)
-        sys.stdout.flush()
-        time.sleep(0.1)
-
-
+                # Keep the depth for later analysis: snapshots plus diffs in segment files
+                try:
+                    newest = book_store.record(data)
+                except (OSError, KeyError, TypeError, ValueError) as e:
+                    logger.error(f"Failed to store order book for {data.get('symbol')}: {e}")
+                    current = latest_books.get(data['symbol'])
+                    newest = current is None or data.get('timestamp', 0) >= current.get('timestamp', 0)
+                # A late update is older than the book already in use; spread and imbalance keep that one
+                if newest:
+                    latest_books[data['symbol']] = data
+                    compute_scheduler.mark(data['symbol'], "book")
+
+        # Hot symbols first, cold ones coalesced; see scheduler.py
+        compute_scheduler.run_cycle(compute_symbol, backlog=trade_queue.qsize())
 
 
 if __name__ == "__main__":
@@ -2,10 +2,14 @@ import websocket
 import json
 import time
 import logging
-from threading import Thread
+import random
+from collections import OrderedDict
+from threading import Thread, Lock
 from queue import Queue
 import os
 
+from time_utils import parse_time_exchange
+
 # Configure logging for websocket_trades.py
 logger = logging.getLogger("websocket_trades")
 logger.setLevel(logging.INFO)
@@ -52,9 +56,9 @@ try:
 except Exception as e:
     print(f"Failed to set up detailed file handler: {e}")
 
-# WebSocket URL and API key
-WS_URL = "wss://ws.coinapi.io/v1/"
-API_KEY = "15e7109f-ca51-4e51-b18f-ad9f63903538"  # Replace with your CoinAPI key
+# WebSocket URL and API key (COINAPI_WS_URL points the bot at a local stand-in, see mock_coinapi_server.py)
+WS_URL = os.environ.get("COINAPI_WS_URL", "wss://ws.coinapi.io/v1/")
+API_KEY = os.environ.get("COINAPI_KEY", "15e7109f-ca51-4e51-b18f-ad9f63903538")  # Set COINAPI_KEY to use your own key
 
 # Subscription message updated to include "book50"
 SUBSCRIPTION = {
@@ -66,21 +70,137 @@ SUBSCRIPTION = {
     "subscribe_filter_exchange_id": ["BITGET"]
 }
 
+# Connections receiving the same stream. One by default; COINAPI_WS_CONNECTIONS=2 or more runs
+# redundant connections (each one counts against the CoinAPI quota) and on_message drops the duplicates
+WS_CONNECTIONS = int(os.environ.get("COINAPI_WS_CONNECTIONS", "1"))
+# Reconnect backoff: first retry is immediate, then jittered exponential up to the maximum
+RECONNECT_BASE_DELAY = 0.25
+RECONNECT_MAX_DELAY = 10
+# A connection that stayed up this long resets its backoff
+STABLE_CONNECTION_SECONDS = 30
+# Trade identities remembered for deduplication across connections
+DEDUP_WINDOW = 20000
+# After an outage, time gaps are reported for symbols seen before it until each has traded once
+# or this many seconds have passed, whichever comes first
+OUTAGE_REPORT_WINDOW_SECONDS = 60
+
 # Queue to store trade and book50 data for processing
 trade_queue = Queue()
 
+# Deduplication and gap tracking shared by all connection threads
+_stream_lock = Lock()
+_seen_messages = OrderedDict()
+_last_sequence = {}  # (connection, type, symbol) -> last sequence number
+_live_connections = set()
+_outage_started = None  # monotonic time when the last live connection went away
+_pending_outage = None  # (seconds, symbols reported, symbols still expected, monotonic recovery time) after an outage
+_last_trade_time = {}  # symbol -> last exchange timestamp (ns) seen on any connection
+gap_stats = {
+    'duplicates': 0,
+    'sequence_gaps': 0,
+    'missed_sequence': 0,
+    'outages': 0,
+    'outage_seconds': 0.0,
+    'reconnects': 0
+}
+
+def _message_identity(data):
+    """Identity of a trade/book50 message that is the same on every connection."""
+    if data.get("uuid"):
+        return data["uuid"]
+    return (data.get("type"), data.get("symbol_id"), data.get("time_exchange"),
+            data.get("price"), data.get("size"))
+
+def _check_stream(ws, data):
+    """Track sequence gaps per connection; return False if another connection already delivered the message."""
+    connection = getattr(ws, "connection_id", 0)
+    symbol = data.get("symbol_id")
+    sequence = data.get("sequence")
+    with _stream_lock:
+        if sequence is not None:
+            key = (connection, data.get("type"), symbol)
+            last = _last_sequence.get(key)
+            if last is not None and sequence > last + 1:
+                gap_stats['sequence_gaps'] += 1
+                gap_stats['missed_sequence'] += sequence - last - 1
+                logger.warning(
+                    f"Sequence gap on connection {connection} for {data.get('type')} {symbol}: "
+                    f"{last} -> {sequence} ({sequence - last - 1} missed on this connection)"
+                )
+            _last_sequence[key] = sequence
+
+        identity = _message_identity(data)
+        if identity in _seen_messages:
+            gap_stats['duplicates'] += 1
+            return False
+        _seen_messages[identity] = True
+        if len(_seen_messages) > DEDUP_WINDOW:
+            _seen_messages.popitem(last=False)
+    return True
+
+def _report_time_gap(symbol, timestamp):
+    """After an outage, report how much exchange time passed between the trades around it."""
+    global _pending_outage
+    with _stream_lock:
+        previous = _last_trade_time.get(symbol)
+        _last_trade_time[symbol] = max(timestamp, previous or 0)
+        if _pending_outage is None:
+            return
+        outage_seconds, reported, expected, restored = _pending_outage
+        if time.monotonic() - restored > OUTAGE_REPORT_WINDOW_SECONDS:
+            _pending_outage = None
+            return
+        if symbol in reported:
+            return
+        reported.add(symbol)
+        if expected <= reported:
+            _pending_outage = None
+    if previous:
+        logger.warning(
+            f"Time gap for {symbol}: {(timestamp - previous) / 1e9:.3f}s between the last trade before "
+            f"and the first trade after a {outage_seconds:.3f}s outage with no live connection"
+        )
+
+def _connection_up(ws):
+    global _outage_started, _pending_outage
+    with _stream_lock:
+        _live_connections.add(ws.connection_id)
+        if _outage_started is not None:
+            outage = time.monotonic() - _outage_started
+            gap_stats['outages'] += 1
+            gap_stats['outage_seconds'] += outage
+            _outage_started = None
+            _pending_outage = (outage, set(), set(_last_trade_time), time.monotonic())
+            logger.warning(f"Stream restored after {outage:.3f}s with no live connection; trades in that window may be missing")
+
+def _connection_down(ws):
+    global _outage_started
+    with _stream_lock:
+        _live_connections.discard(ws.connection_id)
+        # Per-connection sequence numbers restart with the next connection
+        for key in [key for key in _last_sequence if key[0] == ws.connection_id]:
+            del _last_sequence[key]
+        if not _live_connections and _outage_started is None:
+            _outage_started = time.monotonic()
+            logger.warning("No live websocket connection")
+
 def on_message(ws, message):
     """Handle incoming WebSocket messages."""
     try:
         data = json.loads(message)
         timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())
+        if data.get("type") in ("trade", "book50") and not _check_stream(ws, data):
+            return  # Already delivered by a redundant connection
         if data.get("type") == "trade":
             trade = {
                 "symbol": data.get("symbol_id", "N/A"),
+                "uuid": data.get("uuid"),
                 "price": float(data.get("price", 0)),
                 "size": float(data.get("size", 0)),
-                "timestamp": data.get("time_exchange", "N/A")
+                # Parsed once here; epoch nanoseconds from here on
+                "timestamp": parse_time_exchange(data.get("time_exchange")) or time.time_ns()
             }
+            _report_time_gap(trade["symbol"], trade["timestamp"])
             # Log regular message
             logger.info(f"Received trade data: {json.dumps(trade)}")
             
@@ -114,7 +234,7 @@ def on_message(ws, message):
                 "symbol": data.get("symbol_id", "N/A"),
                 "bids": data.get("bids", []),
                 "asks": data.get("asks", []),
-                "timestamp": data.get("time_exchange", "N/A")
+                "timestamp": parse_time_exchange(data.get("time_exchange")) or time.time_ns()
             }
             # Log regular message
             logger.info(f"Received book50 data: {json.dumps(book)}")
@@ -145,8 +265,8 @@ def on_message(ws, message):
             )
             
         elif data.get("type") == "error":
-            logger.error(f"Error from server: {data.get('message', 'Unknown error')}")
-            ws.close()
+            # Keep the connection; the server closes it itself if the error is fatal
+            logger.error(f"Error from server on connection {getattr(ws, 'connection_id', 0)}: {data.get('message', 'Unknown error')}")
         elif data.get("type") == "heartbeat":
             logger.debug("Heartbeat received")
         else:
@@ -157,31 +277,53 @@ def on_message(ws, message):
         logger.error(f"Error processing message: {e}")
 
 def on_error(ws, error):
-    logger.error(f"WebSocket error: {error}")
+    logger.error(f"WebSocket error on connection {getattr(ws, 'connection_id', 0)}: {error}")
 
 def on_close(ws, close_status_code, close_msg):
-    logger.info(f"Connection closed - Status: {close_status_code}, Message: {close_msg}")
+    logger.info(f"Connection {getattr(ws, 'connection_id', 0)} closed - Status: {close_status_code}, Message: {close_msg}")
 
 def on_open(ws):
-    logger.info("WebSocket connection opened")
+    logger.info(f"WebSocket connection {getattr(ws, 'connection_id', 0)} opened")
     ws.send(json.dumps(SUBSCRIPTION))
+    _connection_up(ws)
 
-def run_websocket():
-    """Run the WebSocket connection with reconnection logic."""
+def run_connection(connection_id):
+    """Keep one connection alive: reconnect immediately, then back off with jitter on repeated failures."""
+    failures = 0
     while True:
+        started = time.monotonic()
+        ws = websocket.WebSocketApp(
+            WS_URL,
+            on_message=on_message,
+            on_error=on_error,
+            on_close=on_close,
+            on_open=on_open
+        )
+        ws.connection_id = connection_id
         try:
-            ws = websocket.WebSocketApp(
-                WS_URL,
-                on_message=on_message,
-                on_error=on_error,
-                on_close=on_close,
-                on_open=on_open
-            )
             ws.run_forever(ping_interval=30, ping_timeout=10)
         except Exception as e:
-            logger.error(f"WebSocket crashed: {e}")
-        logger.info("Attempting to reconnect in 5 seconds...")
-        time.sleep(5)
+            logger.error(f"WebSocket {connection_id} crashed: {e}")
+        finally:
+            _connection_down(ws)
+        failures = 0 if time.monotonic() - started >= STABLE_CONNECTION_SECONDS else failures + 1
+        delay = 0 if failures <= 1 else min(RECONNECT_MAX_DELAY, RECONNECT_BASE_DELAY * 2 ** (failures - 2))
+        delay *= random.uniform(0.5, 1.0)
+        with _stream_lock:
+            gap_stats['reconnects'] += 1
+        logger.info(f"Reconnecting connection {connection_id} in {delay:.2f}s...")
+        time.sleep(delay)
+
+def run_websocket():
+    """Run WS_CONNECTIONS redundant connections; trades are deduplicated across them."""
+    threads = [
+        Thread(target=run_connection, args=(index,), daemon=True, name=f"WebSocketConnection{index}")
+        for index in range(WS_CONNECTIONS)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
 
 if __name__ == "__main__":
     ws_thread = Thread(target=run_websocket, daemon=True)